@@ -1,14 +1,20 @@
 from fastapi import APIRouter, HTTPException
-from pathlib import Path
+from fastapi.responses import StreamingResponse
+import json
 import logging
 
-from app.db.chroma_client import get_chroma_client, ChromaSearchClient
-
-from app.services.analysis.text_similarity import segment_sentences
-from app.services.analysis.text_similarity import SemanticSimilarityService
-from app.services.analysis.paraphrase import ParaphraseDetector
-from app.services.scoring.scoring import compute_originality_score
-from app.services.report.report_builder import build_report
+from app.services.analysis.pipeline import (
+    analyze_assignment,
+    extracted_text_path,
+    iter_analysis_events,
+    load_sentences,
+)
+from app.services.jobs.job_queue import (
+    get_job_queue,
+    JobQueueFull,
+    COMPLETED,
+    FAILED,
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -16,61 +22,79 @@ logger = logging.getLogger(__name__)
 
 @router.post("/run")
 def run_analysis(assignment_id: str):
-    upload_dir = Path(f"data/uploads/{assignment_id}")
-    extracted_path = upload_dir / "extracted.txt"
+    try:
+        return analyze_assignment(assignment_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=400, detail="Extracted text not found")
+
 
-    if not extracted_path.exists():
+# Streaming mode: Server-Sent Events, flags first, score last
+
+@router.get("/stream")
+def stream_analysis(assignment_id: str):
+    try:
+        sentences = load_sentences(assignment_id)
+    except FileNotFoundError:
         raise HTTPException(status_code=400, detail="Extracted text not found")
 
-    # Load text
-    text = extracted_path.read_text(encoding="utf-8")
-    sentences = segment_sentences(text)
+    def event_stream():
+        try:
+            for event, payload in iter_analysis_events(assignment_id, sentences):
+                yield _sse(event, payload)
+        except Exception as e:
+            logger.exception("Streaming analysis failed for %s", assignment_id)
+            yield _sse("error", {"detail": str(e)})
 
-    # Chroma
-    client = get_chroma_client()
-    corpus_collection = client.get_or_create_collection(
-        name="corpus_plagiarism",
-        metadata={"hnsw:space": "cosine"}
-    )
-    chroma_search = ChromaSearchClient(corpus_collection)
-
-    # Semantic similarity
-    similarity_service = SemanticSimilarityService(chroma_search)
-    semantic_matches = similarity_service.analyze(sentences)
-
-    # Paraphrase detection
-    paraphrase_detector = ParaphraseDetector()
-    paraphrase_matches = []
-
-    for i, s in enumerate(sentences):
-        paraphrase_matches.extend(
-            paraphrase_detector.detect(
-                sentence_id=i,
-                sentence=s,
-                corpus_sentences=corpus_collection.get()["documents"]
-            )
-        )
-
-    # Merge flags
-    flagged_items = semantic_matches + paraphrase_matches
-
-    # Scoring
-    score = compute_originality_score(
-        total_sentences=len(sentences),
-        flagged_items=flagged_items
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
-    # Final report
-    report = build_report(
-        assignment_id=assignment_id,
-        sentences=sentences,
-        flagged_items=flagged_items,
-        score=score
-    )
-    
-    print("Corpus count:", corpus_collection.count())
+
+def _sse(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+# Job mode: submit now, poll for the report later
+
+@router.post("/jobs", status_code=202)
+def submit_analysis_job(assignment_id: str):
+    if not extracted_text_path(assignment_id).exists():
+        raise HTTPException(status_code=400, detail="Extracted text not found")
+
+    try:
+        job_id = get_job_queue().submit(assignment_id)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
     return {
+        "job_id": job_id,
         "assignment_id": assignment_id,
-        "report": report
+        "status": "queued"
     }
+
+
+@router.get("/jobs/{job_id}")
+def get_analysis_job(job_id: str):
+    status = get_job_queue().status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@router.get("/jobs/{job_id}/report")
+def get_analysis_job_report(job_id: str):
+    queue = get_job_queue()
+    status = queue.status(job_id)
+
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if status["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=status["error"])
+
+    if status["status"] != COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+
+    return queue.result(job_id)
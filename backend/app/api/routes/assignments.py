@@ -1,41 +1,112 @@
-from fastapi import APIRouter, UploadFile, HTTPException, File
+from fastapi import APIRouter, BackgroundTasks, UploadFile, HTTPException, File
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
-import uuid
+from typing import Optional
 import logging
+import os
 
+from app.services.storage.file_store import FileStore
 from app.utils.text_extraction import extract_text_from_file
 from app.services.analysis.text_similarity import segment_sentences
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+SUPPORTED_SUFFIXES = (".txt", ".pdf")
+EXTRACTING = "extracting"
+UPLOADED = "uploaded"
+FAILED = "failed"
+
 
 @router.post("/upload")  # keep your existing response_model as-is
-async def upload_assignment(file: UploadFile = File(...)):
-    assignment_id = str(uuid.uuid4())
-    upload_dir = Path(f"data/uploads/{assignment_id}")
-    upload_dir.mkdir(parents=True, exist_ok=True)
+async def upload_assignment(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    deferred: bool = False,
+    course_id: Optional[str] = None,
+    student_id: Optional[str] = None
+):
+    """
+    Stream the upload to disk and extract its text (OCR for scanned pages).
+    Extraction runs off the event loop; with `deferred=true` the response
+    returns straight away and GET /assignments/{id}/status reports progress.
+
+    With a `course_id` the analysis also checks the submission against the
+    course's other submissions (never the same `student_id`'s) and adds it
+    to that cohort; `student_id` is then required, or a re-upload would be
+    flagged against the student's own earlier versions.
+    """
+    if Path(file.filename or "").suffix.lower() not in SUPPORTED_SUFFIXES:
+        raise HTTPException(status_code=415, detail="Unsupported file type")
+    if course_id and not student_id:
+        raise HTTPException(status_code=422, detail="student_id is required with course_id")
 
-    file_path = upload_dir / file.filename
+    store = FileStore()
+    assignment_id = await store.save_upload(file)
+    file_path = Path(store.get_upload_path(assignment_id, file.filename))
 
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    if course_id:
+        store.write_submission(assignment_id, {"course_id": course_id, "student_id": student_id})
 
-    text = extract_text_from_file(file_path)
+    store.write_status(assignment_id, {"status": EXTRACTING, "filename": file.filename})
 
-    extracted_path = upload_dir / "extracted.txt"
-    extracted_path.write_text(text, encoding="utf-8")
+    if deferred:
+        background_tasks.add_task(_extract_and_store, store, assignment_id, file_path)
+        return {
+            "assignment_id": assignment_id,
+            "filename": file.filename,
+            "total_sentences": 0,
+            "preview_sentences": [],
+            "status": EXTRACTING,
+            "message": "File uploaded, text extraction running",
+        }
 
-    sentences = segment_sentences(text)
+    status = await run_in_threadpool(_extract_and_store, store, assignment_id, file_path)
+    if status["status"] == FAILED:
+        raise HTTPException(status_code=status["code"], detail=status["error"])
 
     return {
         "assignment_id": assignment_id,
         "filename": file.filename,
-        "total_sentences": len(sentences),
+        "total_sentences": status["total_sentences"],
 
-        "preview_sentences": sentences[:5],  # small preview for UI/debug
-        "status": "uploaded",
+        "preview_sentences": status["preview_sentences"],  # small preview for UI/debug
+        "status": UPLOADED,
         "message": "File processed successfully",
 
     }
 
+
+@router.get("/{assignment_id}/status")
+def get_upload_status(assignment_id: str):
+    status = FileStore().read_status(assignment_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    return dict(status, assignment_id=assignment_id)
+
+
+def _extract_and_store(store: FileStore, assignment_id: str, file_path: Path) -> dict:
+    """Extract text, write extracted.txt and record the outcome as the upload status."""
+    try:
+        text = extract_text_from_file(file_path)
+    except HTTPException as e:
+        status = {"status": FAILED, "code": e.status_code, "error": e.detail}
+    except Exception as e:
+        logger.exception("Text extraction failed for %s", assignment_id)
+        status = {"status": FAILED, "code": 500, "error": f"Text extraction failed: {e}"}
+    else:
+        # Atomic, so analysis never reads a half-written file
+        extracted_path = Path(store.get_assignment_dir(assignment_id)) / "extracted.txt"
+        tmp_path = extracted_path.with_suffix(".tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, extracted_path)
+
+        sentences = segment_sentences(text)
+        status = {
+            "status": UPLOADED,
+            "total_sentences": len(sentences),
+            "preview_sentences": sentences[:5],
+        }
+
+    store.write_status(assignment_id, dict(status, filename=file_path.name))
+    return status
@@ -1,7 +1,36 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.config import RESULT_CACHE_ENABLED
+from app.db.chroma_collections import check_chroma_health
+from app.db.corpus_shards import load_shard_registry
+from app.db.vector_backends import shard_latency_stats
+from app.services.cache.embedding_cache import embedding_cache_stats
+from app.services.cache.result_cache import get_result_cache
 
 router = APIRouter()
 
 @router.get("/")
-async def health_check():
-    return {"status": "OK"}
\ No newline at end of file
+def health_check():
+    chroma = check_chroma_health()
+    if not chroma["ok"]:
+        return JSONResponse(status_code=503, content={"status": "DEGRADED", "chroma": chroma})
+    return {"status": "OK", "chroma": chroma}
+
+@router.get("/caches")
+def cache_stats():
+    """Hit rates of this process's result and embedding caches."""
+    return {
+        "results": get_result_cache().stats() if RESULT_CACHE_ENABLED else None,
+        "embeddings": embedding_cache_stats(),
+    }
+
+@router.get("/shards")
+def shard_stats():
+    """Corpus shards as last ingested, and this process's per-shard search latency."""
+    registry = load_shard_registry()
+    return {
+        "mode": registry.get("mode", "none"),
+        "shards": registry.get("shards", {}),
+        "latency": shard_latency_stats(),
+    }
@@ -0,0 +1,137 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../..")
+)
+
+# Versioned, memory-mapped corpus embeddings (one sub-directory per model)
+EMBEDDING_STORE_PATH = os.getenv(
+    "EMBEDDING_STORE_PATH",
+    os.path.join(BASE_DIR, "embedding_store")
+)
+
+# How many old store versions to keep around after a rebuild
+EMBEDDING_STORE_KEEP_VERSIONS = int(os.getenv("EMBEDDING_STORE_KEEP_VERSIONS", "2"))
+
+# Sentences per model forward pass / query vectors per Chroma round trip
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "128"))
+
+# Sentence-transformer models
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+PARAPHRASE_MODEL_NAME = os.getenv("PARAPHRASE_MODEL_NAME", "paraphrase-mpnet-base-v2")
+
+# Load models during FastAPI startup instead of on the first request
+WARM_UP_MODELS = os.getenv("WARM_UP_MODELS", "false").lower() in ("1", "true", "yes")
+
+# Background analysis jobs
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+ANALYSIS_MAX_QUEUE = int(os.getenv("ANALYSIS_MAX_QUEUE", "32"))
+ANALYSIS_JOB_HISTORY = int(os.getenv("ANALYSIS_JOB_HISTORY", "500"))
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "local")
+
+# Sentences analysed per Server-Sent Events batch in /analysis/stream
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "16"))
+
+# Content-addressed analysis result cache
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_CACHE_PATH = os.getenv(
+    "RESULT_CACHE_PATH",
+    os.path.join(BASE_DIR, "cache", "analysis_results.sqlite3")
+)
+RESULT_CACHE_MEMORY_ITEMS = int(os.getenv("RESULT_CACHE_MEMORY_ITEMS", "20000"))
+RESULT_CACHE_DISK_ITEMS = int(os.getenv("RESULT_CACHE_DISK_ITEMS", "2000000"))
+
+# MinHash/LSH near-duplicate index over corpus word shingles
+NEAR_DUPLICATE_INDEX_PATH = os.getenv(
+    "NEAR_DUPLICATE_INDEX_PATH",
+    os.path.join(BASE_DIR, "near_duplicate_index")
+)
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.5"))
+
+# Pipelined corpus ingestion
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+
+# Rows per page when ingest reads the corpus back to rebuild derived indexes
+CORPUS_PAGE_SIZE = int(os.getenv("CORPUS_PAGE_SIZE", "5000"))
+
+# Vector search backend for semantic similarity: chroma | flat | ivf
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+# IVF: number of inverted lists (0 = about 4 * sqrt(corpus size)) and lists probed per query
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+
+# Corpus vector storage used for search: float32 | float16 | int8 (per-vector scale)
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float32")
+# Re-score the best quantized candidates with the float32 vectors
+QUANTIZED_RERANK = os.getenv("QUANTIZED_RERANK", "true").lower() in ("1", "true", "yes")
+QUANTIZED_RERANK_FACTOR = int(os.getenv("QUANTIZED_RERANK_FACTOR", "10"))
+
+# Paraphrase detection: "exhaustive" scores the whole corpus with mpnet;
+# "cascade" (opt-in) scores only the PARAPHRASE_CANDIDATES nearest MiniLM hits
+# per sentence and can miss flags - check with paraphrase_cascade_report.py
+PARAPHRASE_MODE = os.getenv("PARAPHRASE_MODE", "exhaustive")
+PARAPHRASE_CANDIDATES = int(os.getenv("PARAPHRASE_CANDIDATES", "100"))
+
+# Inference backend per model: torch | onnx (run export_onnx_models.py first)
+EMBEDDING_MODEL_BACKEND = os.getenv("EMBEDDING_MODEL_BACKEND", "torch")
+PARAPHRASE_MODEL_BACKEND = os.getenv("PARAPHRASE_MODEL_BACKEND", "torch")
+MODEL_BACKENDS = {
+    EMBEDDING_MODEL_NAME: EMBEDDING_MODEL_BACKEND,
+    PARAPHRASE_MODEL_NAME: PARAPHRASE_MODEL_BACKEND,
+}
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", os.path.join(BASE_DIR, "onnx_models"))
+# Load the dynamically int8-quantized export instead of the float32 one
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "true").lower() in ("1", "true", "yes")
+# ONNX Runtime intra-op threads per process (0 = runtime default)
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+
+# Shared embedding batcher: concurrent analyses are merged into one
+# length-sorted forward pass, waiting at most EMBED_BATCH_MAX_WAIT_MS
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "true").lower() in ("1", "true", "yes")
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+EMBED_BATCH_MAX_SENTENCES = int(os.getenv("EMBED_BATCH_MAX_SENTENCES", "512"))
+
+# Sentence embedding cache keyed by normalised-sentence hash + model:
+# in-memory LRU in front of a memory-mapped on-disk ring per model. The
+# ring is preallocated at disk items * dim * 4 bytes (~150 MB for MiniLM)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(BASE_DIR, "cache", "embeddings"))
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "50000"))
+EMBEDDING_CACHE_DISK_ITEMS = int(os.getenv("EMBEDDING_CACHE_DISK_ITEMS", "100000"))
+
+# Page-parallel PDF extraction / OCR
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+# Pages rasterised together by one OCR task (bounds memory per worker)
+OCR_WINDOW_PAGES = int(os.getenv("OCR_WINDOW_PAGES", "4"))
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+
+# Uploads are streamed to disk in chunks of this many bytes
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1 << 20)))
+
+# Corpus sharding: none | domain (top-level folder under data/corpus) | hash | size
+CORPUS_SHARDING = os.getenv("CORPUS_SHARDING", "none")
+CORPUS_HASH_SHARDS = int(os.getenv("CORPUS_HASH_SHARDS", "4"))
+# size mode: approximate sentences per shard before a new one is opened
+CORPUS_SHARD_MAX_ROWS = int(os.getenv("CORPUS_SHARD_MAX_ROWS", "250000"))
+# Threads fanning a query batch out to the shards
+SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", "8"))
+
+# Cohort index: submissions uploaded with a course_id are checked against,
+# then added to, that course's student_text collection
+COHORT_INDEX_ENABLED = os.getenv("COHORT_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+COHORT_TOP_K = int(os.getenv("COHORT_TOP_K", "3"))
+
+# Cohort all-pairs similarity (cohort_similarity.py): rows per matmul block,
+# threads scoring blocks, and sentences shared by more than this fraction of
+# the cohort's students treated as template text
+COHORT_REPORT_PATH = os.getenv("COHORT_REPORT_PATH", os.path.join(BASE_DIR, "cohort_reports"))
+COHORT_BLOCK_SIZE = int(os.getenv("COHORT_BLOCK_SIZE", "4096"))
+COHORT_WORKERS = int(os.getenv("COHORT_WORKERS", str(os.cpu_count() or 1)))
+COHORT_BOILERPLATE_FRACTION = float(os.getenv("COHORT_BOILERPLATE_FRACTION", "0.1"))
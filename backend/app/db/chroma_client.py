@@ -1,16 +1,32 @@
 import os
+import threading
 import chromadb
 from chromadb.config import Settings
 
+from app.db.vector_backends import ChromaBackend
+
 class ChromaSearchClient:
-    def __init__(self, collection):
+    """
+    Corpus search used by the analysis services. Queries go to Chroma by
+    default or to any other `VectorBackend` (see VECTOR_BACKEND).
+    """
+
+    def __init__(self, collection, backend=None):
         self.collection = collection
+        self.backend = backend or ChromaBackend(collection)
+
+    def count(self):
+        return self.backend.count()
 
     def query(self, embedding, top_k=3):
-        return self.collection.query(
-            query_embeddings=[embedding],
-            n_results=top_k
-        )
+        return self.backend.query_batch([embedding], top_k=top_k)
+
+    def query_batch(self, embeddings, top_k=3, chunk_size=128):
+        """
+        Multi-vector query sent in chunks. Returns one result list per
+        embedding, in the same shape as `query` (documents/metadatas/distances).
+        """
+        return self.backend.query_batch(embeddings, top_k=top_k, chunk_size=chunk_size)
 
 BASE_DIR = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "../../..")
@@ -24,11 +40,46 @@ os.makedirs(CHROMA_PATH, exist_ok=True)
 print("🧠 Using CHROMA_PATH:", CHROMA_PATH)
 
 
+_client = None
+_client_lock = threading.Lock()
+
+
 def get_chroma_client():
-    return chromadb.Client(
-        Settings(
-            is_persistent=True,              
-            persist_directory=CHROMA_PATH,
-            anonymized_telemetry=False
-        )
-    )
+    """
+    Process-wide client. Creating one re-opens the SQLite store and the
+    HNSW segments, so it is done once and shared by every thread.
+    """
+    global _client
+
+    client = _client
+    if client is not None:
+        return client
+
+    with _client_lock:
+        if _client is None:
+            _client = chromadb.Client(
+                Settings(
+                    is_persistent=True,              
+                    persist_directory=CHROMA_PATH,
+                    anonymized_telemetry=False
+                )
+            )
+        return _client
+
+
+def reset_chroma_client():
+    """
+    Drop the shared client; the next get_chroma_client() reconnects.
+    chromadb keeps one System per persist directory behind every Client,
+    so that cache is cleared too, or the new client would reuse it.
+    """
+    global _client
+
+    with _client_lock:
+        _client = None
+        try:
+            from chromadb.api.client import SharedSystemClient
+        except ImportError:
+            # Older chromadb: every Client() builds its own System
+            return
+        SharedSystemClient.clear_system_cache()
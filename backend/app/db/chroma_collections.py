@@ -1,5 +1,12 @@
 # app/db/chroma_collections.py
-from app.db.chroma_client import get_chroma_client
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.db.chroma_client import get_chroma_client, reset_chroma_client
+
+logger = logging.getLogger(__name__)
 
 COLLECTION_NAMES = {
     "student_text": "student_text",
@@ -8,15 +15,87 @@ COLLECTION_NAMES = {
     "ai_generated": "ai_generated"
 }
 
-def init_chroma_collections():
-    client = get_chroma_client()
+DEFAULT_METADATA = {"hnsw:space": "cosine"}
+
+# Collection handles shared by every request in this process
+_handles: Dict[str, Any] = {}
+_handles_lock = threading.Lock()
+
 
+def init_chroma_collections():
     for name in COLLECTION_NAMES.values():
-        client.get_or_create_collection(
-            name=name,
-            metadata={"hnsw:space": "cosine"}
-        )
+        get_collection_handle(name)
 
 def get_collection(name: str):
-    client = get_chroma_client()
-    return client.get_collection(COLLECTION_NAMES[name])
+    return get_collection_handle(COLLECTION_NAMES[name])
+
+
+def get_collection_handle(name: str, metadata: Optional[Dict] = None):
+    """Cached get_or_create_collection on the shared client."""
+    handle = _handles.get(name)
+    if handle is not None:
+        return handle
+
+    with _handles_lock:
+        handle = _handles.get(name)
+        if handle is None:
+            handle = get_chroma_client().get_or_create_collection(
+                name=name,
+                metadata=metadata or DEFAULT_METADATA
+            )
+            _handles[name] = handle
+        return handle
+
+
+def drop_collection(name: str):
+    """Delete a collection and its pooled handle (for rebuilding it from scratch)."""
+    with _handles_lock:
+        _handles.pop(name, None)
+        client = get_chroma_client()
+        # Deleting a missing collection raises a version-dependent error
+        client.get_or_create_collection(name=name, metadata=DEFAULT_METADATA)
+        client.delete_collection(name)
+
+
+def reset_chroma_handles():
+    with _handles_lock:
+        _handles.clear()
+    reset_chroma_client()
+
+
+def check_chroma_health() -> Dict[str, Any]:
+    """
+    Heartbeat plus a count on every pooled collection. If the heartbeat
+    fails the client and pool are dropped, so the next request reconnects;
+    a collection whose count fails only loses its own pooled handle.
+    """
+    started = time.perf_counter()
+    try:
+        get_chroma_client().heartbeat()
+    except Exception as e:
+        logger.exception("Chroma heartbeat failed")
+        reset_chroma_handles()
+        return {"ok": False, "error": str(e)}
+
+    with _handles_lock:
+        handles = dict(_handles)
+
+    counts, errors = {}, {}
+    for name, handle in handles.items():
+        try:
+            counts[name] = handle.count()
+        except Exception as e:
+            logger.warning("Chroma count failed for %s: %s", name, e)
+            errors[name] = str(e)
+            with _handles_lock:
+                if _handles.get(name) is handle:
+                    del _handles[name]
+
+    health = {
+        "ok": not errors,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        "collections": counts,
+    }
+    if errors:
+        health["errors"] = errors
+    return health
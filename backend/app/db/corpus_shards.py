@@ -0,0 +1,201 @@
+# app/db/corpus_shards.py
+import json
+import os
+import re
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import (
+    CORPUS_PAGE_SIZE,
+    CORPUS_SHARDING,
+    CORPUS_HASH_SHARDS,
+    CORPUS_SHARD_MAX_ROWS,
+)
+from app.db.chroma_client import CHROMA_PATH
+from app.db.chroma_collections import get_collection_handle
+
+CORPUS_COLLECTION_NAME = "corpus_plagiarism"
+SHARDS_PATH = os.path.join(CHROMA_PATH, "corpus_shards.json")
+
+# Unsharded corpus: the plain corpus_plagiarism collection
+UNSHARDED = ""
+
+# size mode estimates a new file's sentence count from its size
+_BYTES_PER_SENTENCE = 120
+
+
+def shard_collection_name(shard: str) -> str:
+    if shard == UNSHARDED:
+        return CORPUS_COLLECTION_NAME
+    return f"{CORPUS_COLLECTION_NAME}__{shard}"
+
+
+def _safe_shard_name(name: str) -> str:
+    # Chroma collection names: [a-zA-Z0-9._-], at most 63 characters
+    return re.sub(r"[^a-zA-Z0-9_-]+", "_", name).strip("_-")[:40] or "general"
+
+
+class ShardRouter:
+    """
+    Decides which shard collection a corpus file lives in. A file keeps the
+    shard recorded in the ingest manifest; new files are placed by
+    CORPUS_SHARDING:
+
+      domain - top-level folder under data/corpus (download_wiki.py groups)
+      hash   - crc32 of the relative path, CORPUS_HASH_SHARDS ways
+      size   - fill s000, s001, ... up to about CORPUS_SHARD_MAX_ROWS sentences
+
+    `registry` is the shard registry size mode starts its fill counts from;
+    by default the one on disk. ingest --full passes an empty one.
+    """
+
+    def __init__(self, manifest, mode: str = CORPUS_SHARDING, registry: Optional[Dict[str, Any]] = None):
+        if mode not in ("none", "domain", "hash", "size"):
+            raise ValueError(f"Unsupported CORPUS_SHARDING: {mode}")
+
+        self.manifest = manifest
+        self.mode = mode
+        self._registry = load_shard_registry() if registry is None else registry
+        self._size_rows: Dict[str, int] = {}
+
+    def shard_for(self, relative_path: str, file: Optional[Path] = None) -> str:
+        entry = self.manifest.files.get(relative_path)
+        if entry is not None and "shard" in entry:
+            return entry["shard"]
+
+        if self.mode == "none":
+            return UNSHARDED
+
+        if self.mode == "domain":
+            parts = Path(relative_path).parts
+            return _safe_shard_name(parts[0]) if len(parts) > 1 else "general"
+
+        if self.mode == "hash":
+            return f"h{zlib.crc32(relative_path.encode('utf-8')) % CORPUS_HASH_SHARDS:02d}"
+
+        return self._next_size_shard(file)
+
+    def collection(self, shard: str):
+        return get_collection_handle(shard_collection_name(shard))
+
+    def _next_size_shard(self, file: Optional[Path]) -> str:
+        if not self._size_rows:
+            for shard, info in self._registry.get("shards", {}).items():
+                if shard.startswith("s"):
+                    self._size_rows[shard] = info.get("rows", 0)
+
+        current = max(self._size_rows, default="s000")
+        estimate = (file.stat().st_size // _BYTES_PER_SENTENCE) if file else 0
+        rows = self._size_rows.get(current, 0)
+
+        if rows and rows + estimate > CORPUS_SHARD_MAX_ROWS:
+            current = f"s{int(current[1:]) + 1:03d}"
+            rows = 0
+
+        self._size_rows[current] = rows + estimate
+        return current
+
+
+# Registry of built shards (written by ingest, read by search)
+
+def load_shard_registry(path: str = SHARDS_PATH) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_shard_registry(shards: Dict[str, Dict[str, Any]], mode: str, path: str = SHARDS_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "mode": mode,
+            "updated_at": datetime.utcnow().isoformat(),
+            "shards": shards,
+        }, f, indent=2)
+    os.replace(tmp_path, path)
+    reset_corpus_shards()
+
+
+_shard_names: Optional[List[str]] = None
+_shards_mtime: Optional[float] = None
+_shards_lock = threading.Lock()
+
+
+def get_corpus_shards() -> Dict[str, Any]:
+    """
+    Pooled collection handle per corpus shard, shard name -> collection.
+    Without a registry (never ingested with sharding) it is the single
+    corpus_plagiarism collection.
+    """
+    global _shard_names, _shards_mtime
+
+    mtime = os.path.getmtime(SHARDS_PATH) if os.path.exists(SHARDS_PATH) else None
+
+    with _shards_lock:
+        if _shard_names is None or _shards_mtime != mtime:
+            _shard_names = sorted(load_shard_registry().get("shards", {})) or [UNSHARDED]
+            _shards_mtime = mtime
+        names = _shard_names
+
+    # Handles come from the pool, so a dropped or reconnected collection is picked up
+    return {shard: get_collection_handle(shard_collection_name(shard)) for shard in names}
+
+
+def reset_corpus_shards():
+    global _shard_names
+
+    with _shards_lock:
+        _shard_names = None
+
+
+class ShardedCollectionView:
+    """
+    Read-only view over every shard with the `get` / `count` surface the
+    index builders use, so they work on sharded and unsharded corpora alike.
+    """
+
+    def __init__(self, shards: Dict[str, Any]):
+        self.shards = shards
+
+    def count(self) -> int:
+        return sum(collection.count() for collection in self.shards.values())
+
+    def get(self, include: Optional[List[str]] = None, **kwargs) -> Dict[str, List]:
+        if include is not None:
+            kwargs["include"] = include
+
+        merged: Dict[str, List] = {"ids": []}
+        for collection in self.shards.values():
+            part = collection.get(**kwargs)
+            for key in ("ids", "documents", "metadatas", "embeddings"):
+                values = part.get(key)
+                if values is not None:
+                    merged.setdefault(key, []).extend(values)
+        return merged
+
+
+def iter_collection_pages(
+    collection,
+    include: List[str],
+    page_size: int = CORPUS_PAGE_SIZE
+) -> Iterator[Dict[str, List]]:
+    """
+    `collection.get` results `page_size` rows at a time, shard by shard for
+    a ShardedCollectionView, so callers never hold the whole corpus.
+    """
+    collections = collection.shards.values() if isinstance(collection, ShardedCollectionView) else [collection]
+
+    for part in collections:
+        offset = 0
+        while True:
+            page = part.get(include=include, limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            yield page
+            if len(page["ids"]) < page_size:
+                break
+            offset += page_size
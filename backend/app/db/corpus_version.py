@@ -0,0 +1,27 @@
+# app/db/corpus_version.py
+import os
+import uuid
+from datetime import datetime
+
+from app.db.chroma_client import CHROMA_PATH
+
+CORPUS_VERSION_PATH = os.path.join(CHROMA_PATH, "corpus_version")
+
+
+def get_corpus_version() -> str:
+    """Changes every time the corpus is re-ingested."""
+    if not os.path.exists(CORPUS_VERSION_PATH):
+        return "unversioned"
+    with open(CORPUS_VERSION_PATH, encoding="utf-8") as f:
+        return f.read().strip() or "unversioned"
+
+
+def bump_corpus_version() -> str:
+    version = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    tmp_path = CORPUS_VERSION_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, CORPUS_VERSION_PATH)
+
+    return version
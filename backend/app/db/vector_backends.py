@@ -0,0 +1,429 @@
+# app/db/vector_backends.py
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import (
+    EMBEDDING_MODEL_NAME,
+    VECTOR_BACKEND,
+    IVF_NLIST,
+    IVF_NPROBE,
+    QUANTIZED_RERANK,
+    QUANTIZED_RERANK_FACTOR,
+    SHARD_SEARCH_WORKERS,
+)
+from app.services.analysis.embedding_store import (
+    CorpusEmbeddingStore,
+    get_embedding_store,
+)
+
+logger = logging.getLogger(__name__)
+
+# Max similarity-matrix cells materialised at once by the flat backend
+_MAX_BLOCK_ELEMENTS = 1 << 24
+
+
+class VectorBackend(ABC):
+    """
+    Nearest-neighbour search over the corpus. Results use Chroma's query
+    shape: one list per query embedding under ids/documents/metadatas/
+    distances, with cosine distance = 1 - similarity.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def query_batch(self, embeddings, top_k: int = 3, chunk_size: int = 128) -> Dict[str, List]:
+        ...
+
+
+class ChromaBackend(VectorBackend):
+    name = "chroma"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def query_batch(self, embeddings, top_k=3, chunk_size=128):
+        merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+
+        for start in range(0, len(embeddings), chunk_size):
+            result = self.collection.query(
+                query_embeddings=_as_lists(embeddings[start:start + chunk_size]),
+                n_results=top_k
+            )
+            for key in merged:
+                merged[key].extend(result[key])
+
+        return merged
+
+
+class ShardedBackend(VectorBackend):
+    """
+    Scatter-gather over one backend per corpus shard: every shard answers
+    the whole batch concurrently on the shard search pool, then each
+    query keeps the top_k smallest distances across shards.
+    """
+
+    name = "sharded"
+
+    def __init__(self, backends: Dict[str, VectorBackend]):
+        self.backends = backends
+
+    def count(self) -> int:
+        return sum(backend.count() for backend in self.backends.values())
+
+    def query_batch(self, embeddings, top_k=3, chunk_size=128):
+        pool = get_shard_search_pool()
+        futures = [
+            pool.submit(_timed_query, shard, backend, embeddings, top_k, chunk_size)
+            for shard, backend in self.backends.items()
+        ]
+        results = [future.result() for future in futures]
+
+        merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for i in range(len(embeddings)):
+            hits = [
+                (distance, result["ids"][i][j], result["documents"][i][j], result["metadatas"][i][j])
+                for result in results
+                for j, distance in enumerate(result["distances"][i])
+            ]
+            hits.sort(key=lambda hit: hit[0])
+            hits = hits[:top_k]
+
+            merged["distances"].append([hit[0] for hit in hits])
+            merged["ids"].append([hit[1] for hit in hits])
+            merged["documents"].append([hit[2] for hit in hits])
+            merged["metadatas"].append([hit[3] for hit in hits])
+
+        return merged
+
+
+# Shard search pool and per-shard latency
+
+_shard_pool: Optional[ThreadPoolExecutor] = None
+_shard_pool_lock = threading.Lock()
+
+_shard_latency: Dict[str, Dict[str, float]] = {}
+_shard_latency_lock = threading.Lock()
+
+
+def get_shard_search_pool() -> ThreadPoolExecutor:
+    global _shard_pool
+
+    with _shard_pool_lock:
+        if _shard_pool is None:
+            _shard_pool = ThreadPoolExecutor(
+                max_workers=SHARD_SEARCH_WORKERS,
+                thread_name_prefix="shard-search"
+            )
+        return _shard_pool
+
+
+def shutdown_shard_search_pool():
+    global _shard_pool
+
+    with _shard_pool_lock:
+        if _shard_pool is not None:
+            _shard_pool.shutdown(wait=False, cancel_futures=True)
+            _shard_pool = None
+
+
+def shard_latency_stats() -> Dict[str, Dict[str, float]]:
+    """Per shard: batched queries served, last / mean / max latency in ms."""
+    with _shard_latency_lock:
+        return {
+            shard: {
+                "queries": stats["queries"],
+                "last_ms": round(stats["last"] * 1000, 2),
+                "mean_ms": round(stats["total"] / max(1, stats["queries"]) * 1000, 2),
+                "max_ms": round(stats["max"] * 1000, 2),
+            }
+            for shard, stats in _shard_latency.items()
+        }
+
+
+def _timed_query(shard: str, backend: VectorBackend, embeddings, top_k: int, chunk_size: int):
+    started = time.perf_counter()
+    result = backend.query_batch(embeddings, top_k=top_k, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - started
+
+    with _shard_latency_lock:
+        stats = _shard_latency.setdefault(shard, {"queries": 0, "last": 0.0, "total": 0.0, "max": 0.0})
+        stats["queries"] += 1
+        stats["last"] = elapsed
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+
+    return result
+
+
+class FlatIndexBackend(VectorBackend):
+    """
+    Batched dot-product search over the memory-mapped corpus matrix.
+    Exact for float32 stores; for quantized stores the best
+    top_k * QUANTIZED_RERANK_FACTOR candidates are re-scored in float32.
+    """
+
+    name = "flat"
+
+    def __init__(self, store: CorpusEmbeddingStore, rerank: bool = QUANTIZED_RERANK):
+        self.store = store
+        self.rerank = rerank and store.codes is not None
+
+    def count(self) -> int:
+        return len(self.store)
+
+    def query_batch(self, embeddings, top_k=3, chunk_size=128):
+        queries = np.asarray(embeddings, dtype=np.float32)
+        rows_per_block = max(1, _MAX_BLOCK_ELEMENTS // max(1, len(self.store)))
+
+        all_rows, all_scores = [], []
+        for start in range(0, len(queries), rows_per_block):
+            block = queries[start:start + rows_per_block]
+            scores = self.store.similarities(block)
+            rows, top_scores = _top_k(scores, self._candidate_k(top_k))
+            for query, candidates, candidate_scores in zip(block, rows, top_scores):
+                candidates, candidate_scores = self._rescore(
+                    query, candidates, candidate_scores, top_k
+                )
+                all_rows.append(candidates)
+                all_scores.append(candidate_scores)
+
+        return self._results(all_rows, all_scores)
+
+    def _candidate_k(self, top_k: int) -> int:
+        return top_k * QUANTIZED_RERANK_FACTOR if self.rerank else top_k
+
+    def _rescore(self, query, candidates, scores, top_k):
+        """Exact float32 scores for the quantized shortlist, best top_k kept."""
+        if not self.rerank or len(candidates) == 0:
+            return candidates, scores
+
+        candidates = np.sort(np.asarray(candidates))
+        exact = self.store.exact_similarities(query[None, :], candidates)
+        rows, top_scores = _top_k(exact, top_k)
+        return candidates[rows[0]], top_scores[0]
+
+    def _results(self, rows_per_query, scores_per_query):
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+
+        for rows, scores in zip(rows_per_query, scores_per_query):
+            result["ids"].append([self.store.ids[r] for r in rows])
+            result["documents"].append([self.store.documents[r] for r in rows])
+            result["metadatas"].append([
+                {"source": self.store.sources[r], "type": "corpus"} for r in rows
+            ])
+            result["distances"].append([float(1 - s) for s in scores])
+
+        return result
+
+
+class IVFIndexBackend(FlatIndexBackend):
+    """
+    Inverted-file approximate search: rows are bucketed under k-means
+    centroids and a query only scores the `nprobe` closest buckets.
+    Higher nprobe = better recall, slower queries.
+
+    `lists` is (centroids, order, offsets) from build_ivf_index; by default
+    the ones saved next to the store by ingest.
+    """
+
+    name = "ivf"
+
+    def __init__(
+        self,
+        store: CorpusEmbeddingStore,
+        nprobe: int = IVF_NPROBE,
+        rerank: bool = QUANTIZED_RERANK,
+        lists: Optional[tuple] = None
+    ):
+        super().__init__(store, rerank=rerank)
+        self.nprobe = nprobe
+
+        lists = lists or get_ivf_lists(store)
+        if lists is None:
+            raise ValueError(f"No IVF lists for {store.path}, run ingest.py with VECTOR_BACKEND=ivf")
+        self.centroids, self.order, self.offsets = lists
+
+    def query_batch(self, embeddings, top_k=3, chunk_size=128):
+        queries = np.asarray(embeddings, dtype=np.float32)
+        nprobe = min(self.nprobe, len(self.centroids))
+
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        all_rows, all_scores = [], []
+        for query, lists in zip(queries, probes):
+            candidates = np.concatenate([
+                self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists
+            ])
+            if len(candidates) == 0:
+                all_rows.append([])
+                all_scores.append([])
+                continue
+
+            candidates.sort()
+            scores = self.store.similarities(query[None, :], candidates)
+            rows, top_scores = _top_k(scores, self._candidate_k(top_k))
+            rows, top_scores = self._rescore(
+                query, candidates[rows[0]], top_scores[0], top_k
+            )
+            all_rows.append(rows)
+            all_scores.append(top_scores)
+
+        return self._results(all_rows, all_scores)
+
+
+# IVF lists (built once per store version, saved next to it)
+
+_IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+_IVF_ORDER_FILE = "ivf_order.npy"
+_IVF_OFFSETS_FILE = "ivf_offsets.npy"
+
+# Lists of the current store version only; replaced when ingest publishes a new one
+_ivf_lists: Optional[tuple] = None
+_ivf_path: Optional[str] = None
+_ivf_lock = threading.Lock()
+
+
+def build_ivf_index(
+    store: CorpusEmbeddingStore,
+    nlist: int = IVF_NLIST,
+    iterations: int = 10,
+    sample_size: int = 100_000,
+    seed: int = 0
+):
+    """Spherical k-means over a sample, then assign every row to a list."""
+    embeddings = store.embeddings
+    n = len(store)
+    nlist = nlist or max(1, int(4 * np.sqrt(n)))
+    nlist = min(nlist, n)
+
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(
+        embeddings[np.sort(rng.choice(n, size=min(n, sample_size), replace=False))],
+        dtype=np.float32
+    )
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assignment == c]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+    assignment = np.empty(n, dtype=np.int64)
+    block = max(1, _MAX_BLOCK_ELEMENTS // nlist)
+    for start in range(0, n, block):
+        rows = np.asarray(embeddings[start:start + block], dtype=np.float32)
+        assignment[start:start + block] = np.argmax(rows @ centroids.T, axis=1)
+
+    order = np.argsort(assignment, kind="stable").astype(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))])
+
+    if store.path is not None:
+        np.save(os.path.join(store.path, _IVF_CENTROIDS_FILE), centroids)
+        np.save(os.path.join(store.path, _IVF_ORDER_FILE), order)
+        np.save(os.path.join(store.path, _IVF_OFFSETS_FILE), offsets)
+
+    return centroids, order, offsets
+
+
+def get_ivf_lists(store: CorpusEmbeddingStore) -> Optional[tuple]:
+    """
+    (centroids, order, offsets) saved next to `store` by ingest, or None if
+    they were never built. Training is left to ingest: k-means over the
+    corpus is far too slow for the request path.
+    """
+    global _ivf_lists, _ivf_path
+
+    if store.path is None:
+        return None
+
+    with _ivf_lock:
+        if _ivf_path != store.path:
+            centroids_path = os.path.join(store.path, _IVF_CENTROIDS_FILE)
+            if not os.path.exists(centroids_path):
+                return None
+
+            _ivf_lists = (
+                np.load(centroids_path),
+                np.load(os.path.join(store.path, _IVF_ORDER_FILE), mmap_mode="r"),
+                np.load(os.path.join(store.path, _IVF_OFFSETS_FILE))
+            )
+            _ivf_path = store.path
+        return _ivf_lists
+
+
+# Factory
+
+def get_vector_backend(collection, name: str = VECTOR_BACKEND) -> VectorBackend:
+    """
+    `collection` is a Chroma collection or a dict of corpus shard -> collection.
+    The flat/IVF stores already hold every shard, so only Chroma fans out.
+    """
+    if name == "chroma":
+        return _chroma_backend(collection)
+
+    if name not in ("flat", "ivf"):
+        raise ValueError(f"Unsupported VECTOR_BACKEND: {name}")
+
+    store = get_embedding_store(EMBEDDING_MODEL_NAME)
+    if store is None or len(store) == 0:
+        logger.warning("No %s embedding store; run ingest.py. Falling back to Chroma", EMBEDDING_MODEL_NAME)
+        return _chroma_backend(collection)
+
+    if name == "flat":
+        return FlatIndexBackend(store)
+
+    lists = get_ivf_lists(store)
+    if lists is None:
+        logger.warning("No IVF lists for %s; run ingest.py. Falling back to flat search", store.path)
+        return FlatIndexBackend(store)
+    return IVFIndexBackend(store, lists=lists)
+
+
+def _chroma_backend(collection: Any) -> VectorBackend:
+    if not isinstance(collection, dict):
+        return ChromaBackend(collection)
+    if len(collection) == 1:
+        return ChromaBackend(next(iter(collection.values())))
+    return ShardedBackend({
+        shard: ChromaBackend(shard_collection) for shard, shard_collection in collection.items()
+    })
+
+
+def _top_k(scores: np.ndarray, k: int):
+    """Per row, indices and scores of the k largest values, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return [[] for _ in scores], [[] for _ in scores]
+
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return (
+        np.take_along_axis(top, order, axis=1),
+        np.take_along_axis(top_scores, order, axis=1)
+    )
+
+
+def _as_lists(embeddings):
+    if isinstance(embeddings, np.ndarray):
+        return embeddings.tolist()
+    return embeddings
@@ -8,6 +8,13 @@ from app.api.routes.health import router as health_router
 from app.api.routes.assignments import router as assignments_router
 from app.api.routes.analysis import router as analysis_router
 from app.db.chroma_collections import init_chroma_collections
+from app.services.analysis.pipeline import get_corpus_collection
+from app.services.plagiarism.exact_match import get_exact_match_collection
+from app.core.config import WARM_UP_MODELS
+from app.services.analysis.model_registry import warm_up_models
+from app.services.jobs.job_queue import shutdown_job_queue
+from app.utils.text_extraction import shutdown_extraction_pool
+from app.db.vector_backends import shutdown_shard_search_pool
 
 # Load environment variables
 load_dotenv()
@@ -28,7 +35,19 @@ app.add_middleware(
 @app.on_event("startup")
 def startup_event():
     print("CHROMA_API_KEY loaded:", bool(os.getenv("CHROMA_API_KEY")))
+    # Open the shared Chroma client and collection handles once, up front
     init_chroma_collections()
+    get_corpus_collection()
+    get_exact_match_collection()
+
+    if WARM_UP_MODELS:
+        warm_up_models()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    shutdown_job_queue()
+    shutdown_extraction_pool()
+    shutdown_shard_search_pool()
 
 # ✅ API Routers
 app.include_router(health_router, prefix="/health", tags=["health"])
@@ -1,63 +1,218 @@
-import os
-import re
-from sentence_transformers import SentenceTransformer
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import CORPUS_SHARDING, EMBEDDING_MODEL_NAME, VECTOR_BACKEND
 from app.db.chroma_client import get_chroma_client
-from dotenv import load_dotenv
+from app.db.chroma_collections import drop_collection
+from app.db.corpus_shards import (
+    ShardRouter,
+    ShardedCollectionView,
+    get_corpus_shards,
+    iter_collection_pages,
+    load_shard_registry,
+    save_shard_registry,
+    shard_collection_name,
+)
+from app.db.vector_backends import build_ivf_index
+from app.db.corpus_version import bump_corpus_version
+from app.services.analysis.corpus_reader import (
+    SENTENCE_SPLIT_REGEX,
+    MIN_SENTENCE_LENGTH,
+    iter_sentence_batches,
+)
+from app.services.analysis.embedding_store import (
+    EmbeddingStoreWriter,
+    load_embedding_store,
+)
+from app.services.analysis.ingest_manifest import IngestManifest
+from app.services.analysis.ingest_pipeline import IngestPipeline
+from app.services.analysis.paraphrase import ParaphraseStoreBuilder
+from app.services.cache.result_cache import clear_result_cache
+from app.services.plagiarism.near_duplicate import NearDuplicateIndexWriter
+from app.services.plagiarism.exact_match import (
+    EXACT_MATCH_COLLECTION_NAME,
+    get_exact_match_collection,
+)
 
-load_dotenv()
+CORPUS_DIR = Path("data/corpus")
 
-CORPUS_DIR = "data/corpus"
-COLLECTION_NAME = "corpus_plagiarism"
+def split_sentences(text: str):
+    text = text.replace("\n", " ").strip()
+    return [
+        s.strip()
+        for s in SENTENCE_SPLIT_REGEX.split(text)
+        if len(s.strip()) > MIN_SENTENCE_LENGTH
+    ]
 
-_SENTENCE_SPLIT_REGEX = re.compile(r'(?<=[.!?])\s+')
+def ingest_corpus(full: bool = False, shard: Optional[str] = None):
+    """
+    Incremental ingestion: only new or changed files are re-embedded, rows
+    of deleted files are removed. Pass full=True to re-ingest everything,
+    or shard=<name> to drop and rebuild that one corpus shard.
+    """
+    if not CORPUS_DIR.exists():
+        raise RuntimeError(f"Corpus directory not found: {CORPUS_DIR.resolve()}")
 
-def split_sentences(text: str):
-    return [s.strip() for s in _SENTENCE_SPLIT_REGEX.split(text) if s.strip()]
+    print("Loading corpus from:", CORPUS_DIR.resolve())
 
-def ingest_corpus():
     client = get_chroma_client()
-    collection = client.get_or_create_collection(
-        name=COLLECTION_NAME,
-        metadata={"hnsw:space": "cosine"}
-    )
-    
-    print("Corpus count BEFORE:", collection.count())
 
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+    manifest = IngestManifest()
+    registry = load_shard_registry()
 
-    for filename in os.listdir(CORPUS_DIR):
-        if not filename.endswith(".txt"):
-            continue
+    if shard is not None and shard not in registry.get("shards", {}):
+        known = ", ".join(sorted(name or "''" for name in registry.get("shards", {}))) or "none"
+        raise RuntimeError(f"Unknown corpus shard '{shard}' (shards: {known})")
+
+    if full:
+        # Exact index is rebuilt from scratch (also clears rows in older layouts)
+        drop_collection(EXACT_MATCH_COLLECTION_NAME)
+        # Re-route every file under the current CORPUS_SHARDING
+        for name in set(registry.get("shards", {})) | set(map(manifest.shard_of, manifest.files)):
+            print(f"Dropping corpus shard {name or '(unsharded)'}")
+            drop_collection(shard_collection_name(name))
+        for entry in manifest.files.values():
+            entry.pop("shard", None)
+        registry = {}
+    elif registry and registry.get("mode") != CORPUS_SHARDING:
+        print(
+            f"⚠️ Corpus was sharded by '{registry.get('mode')}', CORPUS_SHARDING is "
+            f"'{CORPUS_SHARDING}': existing files keep their shard until ingest --full"
+        )
+
+    exact_collection = get_exact_match_collection(client)
+    # After --full the dropped shards' row counts must not seed size mode
+    router = ShardRouter(manifest, registry=registry)
+
+    if shard is not None:
+        print(f"Rebuilding corpus shard {shard or '(unsharded)'}")
+        drop_collection(shard_collection_name(shard))
+
+    print("Corpus count BEFORE:", _corpus_count())
 
-        path = os.path.join(CORPUS_DIR, filename)
-        text = open(path, encoding="utf-8", errors="ignore").read()
+    seen = set()
+    changed = []
 
-        sentences = split_sentences(text)
-        if not sentences:
+    # RECURSIVE INGESTION
+    for file in sorted(CORPUS_DIR.rglob("*.txt")):
+        relative_path = str(file.relative_to(CORPUS_DIR))
+        seen.add(relative_path)
+
+        if shard is None and not full and manifest.is_unchanged(relative_path, file):
             continue
 
-        embeddings = model.encode(
-            sentences,
-            normalize_embeddings=True
-        ).tolist()
-
-        collection.add(
-            ids=[f"{filename}_{i}" for i in range(len(sentences))],
-            documents=sentences,
-            embeddings=embeddings,
-            metadatas=[
-                {
-                    "source": filename,
-                    "type": "corpus"   # 🔐 IMMUTABLE
-                }
-            ] * len(sentences)
+        # Routed exactly once: size mode advances its fill counters per call
+        file_shard = router.shard_for(relative_path, file)
+        if shard is None or file_shard == shard:
+            # With --shard, only this shard's files, all of them
+            changed.append((relative_path, file, file_shard))
+
+    total_ingested = 0
+
+    if changed:
+        # Mark derived indexes dirty before touching any rows
+        manifest.pending_rebuild = True
+        manifest.save()
+
+        total_ingested = IngestPipeline(
+            None,
+            exact_collection,
+            manifest,
+            read_batches=iter_sentence_batches,
+            remove_file_rows=_remove_file_rows,
+            router=router
+        ).run(changed)
+
+    touched = {file_shard for _, _, file_shard in changed}
+
+    for relative_path in sorted(set(manifest.files) - seen):
+        if shard is not None and manifest.shard_of(relative_path) != shard:
+            continue
+        touched.add(manifest.shard_of(relative_path))
+        print(f"Removing deleted file {relative_path}")
+        manifest.pending_rebuild = True
+        _remove_file_rows(
+            router.collection(manifest.shard_of(relative_path)),
+            exact_collection,
+            relative_path
         )
+        manifest.forget(relative_path)
+        manifest.save()
+
+    _save_registry(manifest, registry, touched)
+
+    print("Corpus count AFTER:", _corpus_count())
+    print(f"Total sentences ingested this run: {total_ingested}")
+
+    if not manifest.pending_rebuild:
+        print("Corpus unchanged, derived indexes are up to date")
+        return
+
+    _rebuild_derived_indexes(ShardedCollectionView(get_corpus_shards()))
+
+    manifest.pending_rebuild = False
+    manifest.save()
+
+    print("Corpus ingestion complete")
+
+
+def _corpus_count() -> int:
+    return ShardedCollectionView(get_corpus_shards()).count()
+
+
+def _save_registry(manifest: IngestManifest, registry: dict, touched: set):
+    """Per-shard row and file counts, read by search to find the shards."""
+    previous = registry.get("shards", {})
+    shards = {}
+    for entry in manifest.files.values():
+        info = shards.setdefault(entry.get("shard", ""), {"rows": 0, "files": 0})
+        info["rows"] += entry["sentences"]
+        info["files"] += 1
+
+    now = datetime.utcnow().isoformat()
+    for name, info in shards.items():
+        # Keep the build time of shards this run did not touch
+        info["updated_at"] = now if name in touched else previous.get(name, {}).get("updated_at", now)
+
+    save_shard_registry(shards, CORPUS_SHARDING)
+
+
+def _remove_file_rows(collection, exact_collection, relative_path: str):
+    collection.delete(where={"source": relative_path})
+    # Exact rows are per file (hash:document_id), so other files keep theirs
+    exact_collection.delete(where={"document_id": relative_path})
+
+
+def _rebuild_derived_indexes(collection):
+    # One paged pass over the corpus feeds every derived index, so memory
+    # stays flat however large the corpus grows
+    count = collection.count()
+    search_store = EmbeddingStoreWriter(EMBEDDING_MODEL_NAME, count)
+    paraphrase_store = ParaphraseStoreBuilder(count)
+    near_duplicate_index = NearDuplicateIndexWriter()
+
+    for page in iter_collection_pages(collection, include=["documents", "metadatas", "embeddings"]):
+        sources = [(meta or {}).get("source", "Unknown") for meta in page["metadatas"]]
+
+        # Search-model embeddings straight from Chroma, for the flat/IVF backends
+        search_store.append(page["ids"], page["documents"], sources, page["embeddings"])
+        # Paraphrase-model embeddings, re-encoding only new or changed rows
+        paraphrase_store.append(page["ids"], page["documents"], sources)
+        # MinHash/LSH index for the near-duplicate stage
+        near_duplicate_index.append(page["ids"], page["documents"], sources)
+
+    search_store.publish()
+    if VECTOR_BACKEND == "ivf":
+        build_ivf_index(load_embedding_store(EMBEDDING_MODEL_NAME))
+
+    print(f"Paraphrase embedding store version: {paraphrase_store.publish()}")
+    print(f"Near-duplicate index version: {near_duplicate_index.publish()}")
 
-        print(f"✅ Ingested {len(sentences)} sentences from {filename}")
-        
-    print("Corpus count AFTER:", collection.count())
+    # Cached analysis results were computed against the old corpus
+    print("Corpus version:", bump_corpus_version())
+    clear_result_cache()
 
-    print("✅ Corpus ingestion complete")
 
 if __name__ == "__main__":
-    ingest_corpus()
\ No newline at end of file
+    ingest_corpus()
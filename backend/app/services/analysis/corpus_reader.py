@@ -0,0 +1,60 @@
+# app/services/analysis/corpus_reader.py
+import re
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List
+
+SENTENCE_SPLIT_REGEX = re.compile(r'(?<=[.!?])\s+')
+MIN_SENTENCE_LENGTH = 10
+
+READ_CHUNK_CHARS = 1 << 20
+# A run of text this long without a sentence boundary is emitted as-is
+MAX_SENTENCE_CHARS = 1 << 16
+
+
+def iter_file_sentences(
+    path: Path,
+    chunk_chars: int = READ_CHUNK_CHARS,
+    max_sentence_chars: int = MAX_SENTENCE_CHARS
+) -> Iterator[str]:
+    """
+    Stream the sentences of a corpus file without loading it whole.
+
+    Yields exactly what `split_sentences(path.read_text())` would: the tail
+    after the last boundary in a chunk is carried into the next chunk, so
+    no sentence is cut, lost or duplicated at chunk edges. Peak memory is
+    about one chunk.
+    """
+    carry = ""
+
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        while True:
+            chunk = f.read(chunk_chars)
+            if not chunk:
+                break
+
+            pieces = SENTENCE_SPLIT_REGEX.split(carry + chunk.replace("\n", " "))
+
+            # The last piece may continue in the next chunk
+            carry = pieces.pop()
+            if len(carry) > max_sentence_chars:
+                pieces.append(carry)
+                carry = ""
+
+            for piece in pieces:
+                piece = piece.strip()
+                if len(piece) > MIN_SENTENCE_LENGTH:
+                    yield piece
+
+    carry = carry.strip()
+    if len(carry) > MIN_SENTENCE_LENGTH:
+        yield carry
+
+
+def iter_sentence_batches(path: Path, batch_size: int) -> Iterator[List[str]]:
+    sentences = iter_file_sentences(path)
+    while True:
+        batch = list(islice(sentences, batch_size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,199 @@
+# app/services/analysis/corpus_text_store.py
+import hashlib
+import json
+import os
+from collections.abc import Sequence
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Sentence text, vector ids and sources of one corpus snapshot, memory-mapped
+# so a process only pages in the rows it actually reads.
+
+_DOCUMENTS = "documents"
+_IDS = "ids"
+_SOURCES_TABLE_FILE = "sources.json"
+_SOURCE_CODES_FILE = "source_codes.npy"
+_ID_HASHES_FILE = "id_hashes.npy"
+_ID_ROWS_FILE = "id_rows.npy"
+
+
+class MappedStrings(Sequence):
+    """Read-only list of UTF-8 strings: one data file + an offsets array."""
+
+    def __init__(self, directory: str, name: str):
+        self._offsets = np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode="r")
+        data_path = os.path.join(directory, f"{name}.bin")
+        # np.memmap refuses empty files
+        if os.path.getsize(data_path):
+            self._data = np.memmap(data_path, dtype=np.uint8, mode="r")
+        else:
+            self._data = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return self._data[start:end].tobytes().decode("utf-8")
+
+
+class _CodedStrings(Sequence):
+    """Few distinct values (sources): a small table + one int32 code per row."""
+
+    def __init__(self, table: List[str], codes: np.ndarray):
+        self._table = table
+        self._codes = codes
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        return self._table[int(self._codes[row])]
+
+
+class CorpusTextStore:
+    """
+    Row-aligned corpus text with an id -> row index (sorted 64-bit id
+    hashes), so callers resolve only the rows they matched instead of
+    loading every corpus sentence.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.documents = MappedStrings(directory, _DOCUMENTS)
+        self.ids = MappedStrings(directory, _IDS)
+
+        with open(os.path.join(directory, _SOURCES_TABLE_FILE), encoding="utf-8") as f:
+            table = json.load(f)
+        self.sources = _CodedStrings(
+            table, np.load(os.path.join(directory, _SOURCE_CODES_FILE), mmap_mode="r")
+        )
+
+        self._id_hashes = np.load(os.path.join(directory, _ID_HASHES_FILE), mmap_mode="r")
+        self._id_rows = np.load(os.path.join(directory, _ID_ROWS_FILE), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows_for(self, ids: List[str]) -> np.ndarray:
+        """Sorted, de-duplicated rows of `ids`; unknown ids are skipped."""
+        if not ids or len(self._id_hashes) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        wanted = list(dict.fromkeys(ids))
+        hashes = np.array([_id_hash(id_) for id_ in wanted], dtype=np.uint64)
+
+        rows = set()
+        for id_, h, start in zip(wanted, hashes, np.searchsorted(self._id_hashes, hashes)):
+            # Walk the (almost always single) run of equal hashes
+            position = int(start)
+            while position < len(self._id_hashes) and self._id_hashes[position] == h:
+                row = int(self._id_rows[position])
+                if self.ids[row] == id_:
+                    rows.add(row)
+                    break
+                position += 1
+
+        return np.array(sorted(rows), dtype=np.int64)
+
+
+class CorpusTextWriter:
+    """
+    Writes a CorpusTextStore page by page: text is streamed to disk and
+    only fixed-width per-row arrays are kept until close().
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.rows = 0
+
+        self._strings = {name: _StringsWriter(directory, name) for name in (_DOCUMENTS, _IDS)}
+        self._source_table: Dict[str, int] = {}
+        self._source_codes: List[np.ndarray] = []
+        self._id_hashes: List[np.ndarray] = []
+
+    def append(self, ids: List[str], documents: List[str], sources: Optional[List[str]] = None):
+        sources = sources or ["Unknown"] * len(ids)
+
+        self._strings[_DOCUMENTS].append(documents)
+        self._strings[_IDS].append(ids)
+        self._source_codes.append(np.array(
+            [self._source_table.setdefault(s, len(self._source_table)) for s in sources],
+            dtype=np.int32
+        ))
+        self._id_hashes.append(np.array([_id_hash(id_) for id_ in ids], dtype=np.uint64))
+        self.rows += len(ids)
+
+    def close(self):
+        for strings in self._strings.values():
+            strings.close()
+
+        with open(os.path.join(self.directory, _SOURCES_TABLE_FILE), "w", encoding="utf-8") as f:
+            json.dump(list(self._source_table), f)
+        np.save(
+            os.path.join(self.directory, _SOURCE_CODES_FILE),
+            np.concatenate(self._source_codes) if self._source_codes else np.zeros(0, dtype=np.int32)
+        )
+
+        hashes = np.concatenate(self._id_hashes) if self._id_hashes else np.zeros(0, dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable").astype(np.int64)
+        np.save(os.path.join(self.directory, _ID_HASHES_FILE), hashes[order])
+        np.save(os.path.join(self.directory, _ID_ROWS_FILE), order)
+
+
+def write_corpus_text_store(
+    directory: str,
+    ids: List[str],
+    documents: List[str],
+    sources: Optional[List[str]] = None
+):
+    writer = CorpusTextWriter(directory)
+    writer.append(ids, documents, sources)
+    writer.close()
+
+
+def has_corpus_text_store(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, _ID_ROWS_FILE))
+
+
+class _StringsWriter:
+    """Appends to <name>.bin; <name>_offsets.npy is written on close()."""
+
+    def __init__(self, directory: str, name: str):
+        self._offsets_path = os.path.join(directory, f"{name}_offsets.npy")
+        self._file = open(os.path.join(directory, f"{name}.bin"), "wb")
+        self._offsets = [np.zeros(1, dtype=np.int64)]
+        self._end = 0
+
+    def append(self, values: List[str]):
+        lengths = np.zeros(len(values), dtype=np.int64)
+        for i, value in enumerate(values):
+            data = value.encode("utf-8")
+            self._file.write(data)
+            lengths[i] = len(data)
+        self._offsets.append(self._end + np.cumsum(lengths))
+        if len(values):
+            self._end = int(self._offsets[-1][-1])
+
+    def close(self):
+        self._file.close()
+        np.save(self._offsets_path, np.concatenate(self._offsets))
+
+
+def _id_hash(id_: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(id_.encode("utf-8"), digest_size=8).digest(), "little"
+    )
@@ -0,0 +1,198 @@
+# app/services/analysis/embedding_batcher.py
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.core.config import (
+    EMBED_BATCH_SIZE,
+    EMBED_BATCHING,
+    EMBED_BATCH_MAX_WAIT_MS,
+    EMBED_BATCH_MAX_SENTENCES,
+    EMBEDDING_CACHE_ENABLED,
+)
+from app.services.analysis.model_registry import get_model
+from app.services.cache.embedding_cache import get_embedding_cache
+from app.services.preprocessing.normalize import hash_sentence, normalize_sentence
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    __slots__ = ("sentences", "done", "embeddings", "error")
+
+    def __init__(self, sentences: List[str]):
+        self.sentences = sentences
+        self.done = threading.Event()
+        self.embeddings = None
+        self.error = None
+
+
+class EmbeddingBatcher:
+    """
+    Merges encode calls from concurrent analyses into shared forward passes.
+
+    A background thread takes the first waiting call, keeps collecting
+    for up to `max_wait_ms` or until `max_sentences` are queued, then
+    encodes the distinct sentences sorted by length (so batches pad
+    little) and hands each caller its own rows. Embeddings are normalised.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_wait_ms: float = EMBED_BATCH_MAX_WAIT_MS,
+        max_sentences: int = EMBED_BATCH_MAX_SENTENCES,
+        batch_size: int = EMBED_BATCH_SIZE
+    ):
+        self.model = model
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_sentences = max_sentences
+        self.batch_size = batch_size
+
+        self.batches = 0
+        self.requests = 0
+        self.sentences = 0
+
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, sentences: List[str]) -> np.ndarray:
+        if not sentences:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        pending = _Pending(list(sentences))
+        self._queue.put(pending)
+        pending.done.wait()
+
+        if pending.error is not None:
+            raise pending.error
+        return pending.embeddings
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "sentences": self.sentences,
+            "requests_per_batch": self.requests / max(1, self.batches),
+        }
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].sentences)
+            deadline = time.monotonic() + self.max_wait
+
+            while size < self.max_sentences:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                size += len(pending.sentences)
+
+            self._run(batch)
+
+    def _run(self, batch: List[_Pending]):
+        # Identical sentences from different callers are encoded once
+        distinct = sorted(
+            dict.fromkeys(s for pending in batch for s in pending.sentences),
+            key=len
+        )
+
+        try:
+            vectors = np.asarray(
+                self.model.encode(
+                    distinct,
+                    batch_size=self.batch_size,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                ),
+                dtype=np.float32
+            )
+            rows = {s: i for i, s in enumerate(distinct)}
+            for pending in batch:
+                pending.embeddings = vectors[[rows[s] for s in pending.sentences]]
+
+            self.batches += 1
+            self.requests += len(batch)
+            self.sentences += len(distinct)
+        except Exception as e:
+            logger.exception("Embedding batch of %d sentences failed", len(distinct))
+            for pending in batch:
+                pending.error = e
+        finally:
+            for pending in batch:
+                pending.done.set()
+
+
+_batchers: Dict[str, EmbeddingBatcher] = {}
+_lock = threading.Lock()
+
+
+def get_embedding_batcher(name: str) -> EmbeddingBatcher:
+    with _lock:
+        batcher = _batchers.get(name)
+        if batcher is None:
+            batcher = EmbeddingBatcher(get_model(name))
+            _batchers[name] = batcher
+        return batcher
+
+
+def encode_sentences(name: str, sentences: List[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """
+    Normalised float32 embeddings of `sentences` with model `name`.
+    Sentences with the same normalised text share one cached embedding;
+    ones that normalise to nothing (punctuation, symbols) are encoded on
+    their own and never cached.
+    """
+    if not EMBEDDING_CACHE_ENABLED or not sentences:
+        return _encode(name, sentences, batch_size)
+
+    cache = get_embedding_cache(name)
+    keys = [hash_sentence(normalize_sentence(s)) for s in sentences]
+    found = cache.get_many({key for key in keys if key})
+
+    missing: Dict[str, str] = {}
+    unkeyed: List[int] = []
+    for i, (sentence, key) in enumerate(zip(sentences, keys)):
+        if not key:
+            unkeyed.append(i)
+        elif key not in found and key not in missing:
+            missing[key] = sentence
+
+    # One forward pass for the distinct uncached sentences plus the unkeyed ones
+    batch = list(missing.values()) + [sentences[i] for i in unkeyed]
+    vectors = _encode(name, batch, batch_size) if batch else None
+
+    if missing:
+        fresh = dict(zip(missing, vectors[:len(missing)]))
+        cache.set_many(fresh)
+        found.update(fresh)
+
+    rows = [found[key] if key else None for key in keys]
+    for i, vector in zip(unkeyed, vectors[len(missing):] if unkeyed else []):
+        rows[i] = vector
+    return np.stack(rows)
+
+
+def _encode(name: str, sentences: List[str], batch_size: int) -> np.ndarray:
+    if EMBED_BATCHING:
+        return get_embedding_batcher(name).encode(sentences)
+
+    return np.asarray(
+        get_model(name).encode(
+            sentences,
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ),
+        dtype=np.float32
+    )
@@ -0,0 +1,428 @@
+# app/services/analysis/embedding_store.py
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.analysis.corpus_text_store import (
+    CorpusTextStore,
+    CorpusTextWriter,
+)
+from app.core.config import (
+    EMBEDDING_STORE_PATH,
+    EMBEDDING_STORE_KEEP_VERSIONS,
+    EMBEDDING_STORE_DTYPE,
+)
+
+# 2: texts/ids in a memory-mapped CorpusTextStore; 1: records.json (still readable)
+STORE_FORMAT_VERSION = 2
+_READABLE_FORMATS = (1, 2)
+
+_CURRENT_FILE = "CURRENT"
+_MANIFEST_FILE = "manifest.json"
+_EMBEDDINGS_FILE = "embeddings.npy"
+_RECORDS_FILE = "records.json"
+_QUANTIZED_FILES = {
+    "float16": "embeddings.f16.npy",
+    "int8": "embeddings.i8.npy",
+}
+_SCALES_FILE = "scales.npy"
+
+# Corpus rows de-quantised to float32 at a time
+_DEQUANTIZE_CHUNK_ROWS = 8192
+
+
+class CorpusEmbeddingStore:
+    """
+    Read-only corpus embedding matrix for one model.
+
+    Rows are L2-normalised float32 vectors, so a dot product is the
+    cosine similarity. `embeddings` is memory-mapped when loaded from disk,
+    and so are ids/documents/sources (a CorpusTextStore, row-aligned).
+
+    With a quantized store (`codes`, float16 or int8 + per-row `scales`)
+    search reads only the compact copy; the float32 rows are touched just
+    for re-ranking, so they need not stay resident.
+    """
+
+    def __init__(
+        self,
+        manifest: Dict,
+        embeddings: np.ndarray,
+        ids: List[str],
+        documents: List[str],
+        sources: List[str],
+        path: Optional[str] = None,
+        codes: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None,
+        texts: Optional[CorpusTextStore] = None
+    ):
+        self.path = path
+        self.texts = texts
+        self.codes = codes
+        self.scales = scales
+        self.manifest = manifest
+        self.embeddings = embeddings
+        self.ids = ids
+        self.documents = documents
+        self.sources = sources
+        self._rows_by_id = None
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+    @property
+    def model_name(self) -> str:
+        return self.manifest["model_name"]
+
+    @property
+    def quantization(self) -> str:
+        return self.manifest.get("quantization", "float32")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows_for(self, ids: List[str]) -> np.ndarray:
+        """Sorted, de-duplicated row numbers of `ids`; unknown ids are skipped."""
+        if self.texts is not None:
+            return self.texts.rows_for(ids)
+
+        if self._rows_by_id is None:
+            self._rows_by_id = {id_: row for row, id_ in enumerate(self.ids)}
+        rows = {self._rows_by_id[id_] for id_ in ids if id_ in self._rows_by_id}
+        return np.array(sorted(rows), dtype=np.int64)
+
+    def similarities(self, queries: np.ndarray, rows=None) -> np.ndarray:
+        """
+        (n_queries, n_rows) cosine similarities against all rows or `rows`.
+        Approximate when the store is quantized.
+        """
+        if self.codes is None:
+            return self.exact_similarities(queries, rows)
+
+        codes = self.codes if rows is None else self.codes[rows]
+        scales = None
+        if self.scales is not None:
+            scales = self.scales if rows is None else self.scales[rows]
+
+        queries = np.asarray(queries, dtype=np.float32)
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+
+        for start in range(0, len(codes), _DEQUANTIZE_CHUNK_ROWS):
+            end = start + _DEQUANTIZE_CHUNK_ROWS
+            block = queries @ np.asarray(codes[start:end], dtype=np.float32).T
+            if scales is not None:
+                block *= scales[start:end]
+            out[:, start:end] = block
+
+        return out
+
+    def exact_similarities(self, queries: np.ndarray, rows=None) -> np.ndarray:
+        embeddings = self.embeddings if rows is None else self.embeddings[rows]
+        return np.asarray(queries, dtype=np.float32) @ np.asarray(embeddings, dtype=np.float32).T
+
+    @classmethod
+    def from_sentences(
+        cls,
+        model,
+        model_name: str,
+        sentences: List[str],
+        ids: Optional[List[str]] = None
+    ):
+        """In-memory store for callers that only have raw corpus sentences."""
+        embeddings = _encode(model, sentences)
+        manifest = _manifest(model_name, "in-memory", embeddings)
+        return cls(
+            manifest=manifest,
+            embeddings=embeddings,
+            ids=ids or [str(i) for i in range(len(sentences))],
+            documents=list(sentences),
+            sources=["Unknown"] * len(sentences)
+        )
+
+
+# Build (ingest time)
+
+def write_embedding_store(
+    model_name: str,
+    ids: List[str],
+    documents: List[str],
+    sources: Optional[List[str]],
+    embeddings: np.ndarray,
+    quantization: str = EMBEDDING_STORE_DTYPE
+) -> str:
+    """Publish already-computed, normalised embeddings as a new version."""
+    writer = EmbeddingStoreWriter(model_name, len(ids), quantization)
+    writer.append(ids, documents, sources, embeddings)
+    return writer.publish()
+
+
+class EmbeddingStoreWriter:
+    """
+    Builds a new store version page by page. Rows go straight into
+    memory-mapped .npy files sized for `count` rows and the text is
+    streamed to a CorpusTextStore, so a build never holds the corpus in
+    memory. publish() points readers at the new version.
+    """
+
+    def __init__(self, model_name: str, count: int, quantization: str = EMBEDDING_STORE_DTYPE):
+        if quantization != "float32" and quantization not in _QUANTIZED_FILES:
+            raise ValueError(f"Unsupported EMBEDDING_STORE_DTYPE: {quantization}")
+
+        self.model_name = model_name
+        self.count = count
+        self.quantization = quantization
+        self.rows = 0
+
+        self.model_dir = _model_dir(model_name)
+        os.makedirs(self.model_dir, exist_ok=True)
+
+        self.version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        self.version_dir = os.path.join(self.model_dir, self.version)
+        os.makedirs(self.version_dir)
+
+        self._texts = CorpusTextWriter(self.version_dir)
+        self._embeddings = None
+        self._codes = None
+        self._scales = None
+
+    def append(self, ids: List[str], documents: List[str], sources: Optional[List[str]], embeddings):
+        if len(ids) == 0:
+            return
+
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self._embeddings is None:
+            self._allocate(embeddings.shape[1])
+
+        end = self.rows + len(ids)
+        if end > self.count:
+            raise ValueError(f"More than {self.count} rows written to {self.version_dir}")
+
+        # float32 is always kept: re-ranking and reuse by the next build
+        self._embeddings[self.rows:end] = embeddings
+        if self._codes is not None:
+            codes, scales = quantize(embeddings, self.quantization)
+            self._codes[self.rows:end] = codes
+            if scales is not None:
+                self._scales[self.rows:end] = scales
+
+        self._texts.append(ids, documents, sources)
+        self.rows = end
+
+    def publish(self) -> str:
+        if self.rows != self.count:
+            raise ValueError(f"Expected {self.count} rows in {self.version_dir}, got {self.rows}")
+        if self._embeddings is None:
+            self._allocate(0)
+
+        for array in (self._embeddings, self._codes, self._scales):
+            if array is not None:
+                array.flush()
+        self._texts.close()
+
+        with open(os.path.join(self.version_dir, _MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(_manifest(self.model_name, self.version, self._embeddings, self.quantization), f, indent=2)
+
+        # Atomically point readers at the new version
+        tmp_path = os.path.join(self.model_dir, _CURRENT_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.version)
+        os.replace(tmp_path, os.path.join(self.model_dir, _CURRENT_FILE))
+
+        _prune_old_versions(self.model_dir)
+        return self.version
+
+    def _allocate(self, dim: int):
+        self._embeddings = self._open(_EMBEDDINGS_FILE, np.float32, (self.count, dim))
+        if self.quantization == "float16":
+            self._codes = self._open(_QUANTIZED_FILES["float16"], np.float16, (self.count, dim))
+        elif self.quantization == "int8":
+            self._codes = self._open(_QUANTIZED_FILES["int8"], np.int8, (self.count, dim))
+            self._scales = self._open(_SCALES_FILE, np.float32, (self.count,))
+
+    def _open(self, name: str, dtype, shape) -> np.ndarray:
+        return np.lib.format.open_memmap(
+            os.path.join(self.version_dir, name), mode="w+", dtype=dtype, shape=shape
+        )
+
+
+def encode_reusing_previous(
+    model,
+    previous: Optional[CorpusEmbeddingStore],
+    ids: List[str],
+    documents: List[str],
+    batch_size: int = 64
+) -> np.ndarray:
+    """
+    (embeddings, rows encoded) for one page of corpus rows. A row whose id
+    still holds the same sentence in `previous` (the version being
+    replaced) is copied from it; only new or changed sentences are encoded.
+    """
+    if not documents:
+        return np.zeros((0, 0), dtype=np.float32), 0
+
+    reused = {}
+    if previous is not None and len(previous):
+        for row in previous.rows_for(ids):
+            reused[previous.ids[row]] = int(row)
+
+    rows = [reused.get(id_) for id_ in ids]
+    rows = [
+        row if row is not None and previous.documents[row] == doc else None
+        for row, doc in zip(rows, documents)
+    ]
+
+    missing = [i for i, row in enumerate(rows) if row is None]
+    fresh = _encode(model, [documents[i] for i in missing], batch_size) if missing else None
+
+    dim = fresh.shape[1] if fresh is not None else previous.embeddings.shape[1]
+    embeddings = np.empty((len(documents), dim), dtype=np.float32)
+    if missing:
+        embeddings[missing] = fresh
+
+    kept = [i for i, row in enumerate(rows) if row is not None]
+    if kept:
+        # Sorted reads keep the memory-mapped previous version sequential
+        source_rows = np.array([rows[i] for i in kept])
+        order = np.argsort(source_rows)
+        embeddings[np.array(kept)[order]] = previous.embeddings[source_rows[order]]
+
+    return embeddings, len(missing)
+
+
+def _encode(model, sentences: List[str], batch_size: int = 64) -> np.ndarray:
+    return np.asarray(
+        model.encode(
+            sentences,
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ),
+        dtype=np.float32
+    )
+
+
+def quantize(embeddings: np.ndarray, quantization: str):
+    """
+    float16: plain cast. int8: per-row scale so the largest component maps
+    to +-127; similarity ~= (query @ codes) * scale.
+    """
+    if quantization == "float16":
+        return embeddings.astype(np.float16), None
+
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(embeddings / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _manifest(model_name: str, version: str, embeddings: np.ndarray, quantization: str = "float32") -> Dict:
+    return {
+        "format_version": STORE_FORMAT_VERSION,
+        "model_name": model_name,
+        "version": version,
+        "quantization": quantization,
+        "count": int(embeddings.shape[0]),
+        "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+        "normalized": True,
+        "created_at": datetime.utcnow().isoformat()
+    }
+
+
+def _prune_old_versions(model_dir: str):
+    versions = sorted(
+        d for d in os.listdir(model_dir)
+        if os.path.isdir(os.path.join(model_dir, d))
+    )
+    for old in versions[:-EMBEDDING_STORE_KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(model_dir, old), ignore_errors=True)
+
+
+# Load (startup / request time)
+
+def _model_dir(model_name: str) -> str:
+    return os.path.join(EMBEDDING_STORE_PATH, model_name.replace("/", "__"))
+
+
+def current_version(model_name: str) -> Optional[str]:
+    current_path = os.path.join(_model_dir(model_name), _CURRENT_FILE)
+    if not os.path.exists(current_path):
+        return None
+    with open(current_path, encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+def load_embedding_store(model_name: str) -> Optional[CorpusEmbeddingStore]:
+    version = current_version(model_name)
+    if version is None:
+        return None
+
+    version_dir = os.path.join(_model_dir(model_name), version)
+
+    with open(os.path.join(version_dir, _MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") not in _READABLE_FORMATS:
+        print(f"⚠️ Embedding store {version_dir} has an unsupported format, ignoring")
+        return None
+
+    texts = None
+    if manifest["format_version"] >= 2:
+        texts = CorpusTextStore(version_dir)
+        records = {"ids": texts.ids, "documents": texts.documents, "sources": texts.sources}
+    else:
+        with open(os.path.join(version_dir, _RECORDS_FILE), encoding="utf-8") as f:
+            records = json.load(f)
+
+    embeddings = np.load(
+        os.path.join(version_dir, _EMBEDDINGS_FILE),
+        mmap_mode="r"
+    )
+
+    codes, scales = None, None
+    quantization = manifest.get("quantization", "float32")
+    if quantization != "float32":
+        codes = np.load(
+            os.path.join(version_dir, _QUANTIZED_FILES[quantization]),
+            mmap_mode="r"
+        )
+        if quantization == "int8":
+            scales = np.load(os.path.join(version_dir, _SCALES_FILE))
+
+    return CorpusEmbeddingStore(
+        manifest=manifest,
+        embeddings=embeddings,
+        ids=records["ids"],
+        documents=records["documents"],
+        sources=records["sources"],
+        path=version_dir,
+        codes=codes,
+        scales=scales,
+        texts=texts
+    )
+
+
+_loaded_stores: Dict[str, CorpusEmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(model_name: str) -> Optional[CorpusEmbeddingStore]:
+    """
+    Process-wide cached store; reloaded when ingest publishes a new version.
+    """
+    version = current_version(model_name)
+    if version is None:
+        return None
+
+    with _stores_lock:
+        store = _loaded_stores.get(model_name)
+        if store is None or store.version != version:
+            store = load_embedding_store(model_name)
+            if store is not None:
+                _loaded_stores[model_name] = store
+        return store
@@ -0,0 +1,95 @@
+# app/services/analysis/ingest_manifest.py
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.db.chroma_client import CHROMA_PATH
+
+MANIFEST_PATH = os.path.join(CHROMA_PATH, "ingest_manifest.json")
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """
+    What has been ingested per corpus file (size, mtime, content hash,
+    sentence count, corpus shard) plus a flag for derived indexes that still need a
+    rebuild. Saved after every file, so an interrupted run resumes where
+    it stopped.
+    """
+
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        self.pending_rebuild = False
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.files = data.get("files", {})
+                self.pending_rebuild = data.get("pending_rebuild", False)
+
+    def is_unchanged(self, relative_path: str, file: Path) -> bool:
+        """Cheap size/mtime check first; content hash only when those moved."""
+        entry = self.files.get(relative_path)
+        if entry is None:
+            return False
+
+        stat = file.stat()
+        if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return True
+
+        if entry["size"] != stat.st_size:
+            return False
+
+        if entry["sha256"] == file_sha256(file):
+            # touched but identical: remember the new mtime so the next
+            # run takes the cheap path again
+            entry["mtime"] = stat.st_mtime
+            self.save()
+            return True
+        return False
+
+    def record(
+        self,
+        relative_path: str,
+        file: Path,
+        sentences: int,
+        sha256: Optional[str] = None,
+        shard: Optional[str] = None
+    ):
+        stat = file.stat()
+        self.files[relative_path] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": sha256 or file_sha256(file),
+            "sentences": sentences,
+        }
+        if shard is not None:
+            self.files[relative_path]["shard"] = shard
+
+    def shard_of(self, relative_path: str) -> str:
+        return self.files.get(relative_path, {}).get("shard", "")
+
+    def forget(self, relative_path: str):
+        self.files.pop(relative_path, None)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": MANIFEST_VERSION,
+                "pending_rebuild": self.pending_rebuild,
+                "files": self.files,
+            }, f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,302 @@
+# app/services/analysis/ingest_pipeline.py
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from app.core.config import (
+    EMBEDDING_MODEL_NAME,
+    EMBED_BATCH_SIZE,
+    INGEST_WORKERS,
+    INGEST_BATCH_SIZE,
+    INGEST_QUEUE_SIZE,
+)
+from app.db.corpus_shards import ShardRouter
+from app.services.analysis.ingest_manifest import IngestManifest, file_sha256
+from app.services.plagiarism.exact_match import ingest_corpus_sentences
+
+_DONE = object()
+
+
+@dataclass
+class CorpusFile:
+    relative_path: str
+    path: Path
+    sha256: str
+    shard: str = ""
+    sentences: int = 0
+    written: int = 0
+    complete: bool = False
+
+
+class IngestPipeline:
+    """
+    reader thread -> batcher (this thread) -> encoder processes -> writer thread
+
+    The reader streams sentences out of each file, the batcher packs
+    sentences from any number of files into fixed-size encode batches, a
+    process pool runs the model on every core and a single writer upserts
+    into Chroma. Queues and the number of in-flight batches are bounded,
+    so memory stays flat.
+
+    With a shard router each file is written to the shard collection it
+    was routed to instead of `collection`.
+    """
+
+    def __init__(
+        self,
+        collection,
+        exact_collection,
+        manifest: IngestManifest,
+        read_batches: Callable[[Path, int], Iterator[List[str]]],
+        remove_file_rows: Callable,
+        workers: int = INGEST_WORKERS,
+        batch_size: int = INGEST_BATCH_SIZE,
+        queue_size: int = INGEST_QUEUE_SIZE,
+        router: Optional[ShardRouter] = None
+    ):
+        self.collection = collection
+        self.exact_collection = exact_collection
+        self.manifest = manifest
+        self.read_batches = read_batches
+        self.remove_file_rows = remove_file_rows
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.router = router
+
+        self.total_sentences = 0
+        self._files = {}
+        self._error = None
+
+    def run(self, files: Iterable[tuple]) -> int:
+        """
+        `files` yields (relative_path, path, shard), the shard as routed by
+        the caller (ignored without a router). Returns sentences ingested.
+        """
+        started = time.time()
+
+        file_queue = queue.Queue(maxsize=self.queue_size)
+        write_queue = queue.Queue(maxsize=self.queue_size)
+
+        reader = threading.Thread(
+            target=self._read, args=(files, file_queue), daemon=True
+        )
+        writer = threading.Thread(
+            target=self._write, args=(write_queue,), daemon=True
+        )
+        reader.start()
+        writer.start()
+
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=ctx,
+            initializer=_init_encoder,
+            initargs=(self.workers,)
+        ) as pool:
+            in_flight = set()
+            batch = []
+
+            def submit(items):
+                # Backpressure: at most two batches queued per encoder
+                while len(in_flight) >= self.workers * 2:
+                    self._drain(in_flight, write_queue, FIRST_COMPLETED)
+                future = pool.submit(_encode_batch, [s for _, _, s in items])
+                future.items = items
+                in_flight.add(future)
+
+            while True:
+                message = file_queue.get()
+                if message is _DONE:
+                    break
+
+                if message[0] != "sentences":
+                    # begin / end markers go straight to the writer
+                    write_queue.put(message)
+                    continue
+
+                _, relative_path, start, sentences = message
+                for i, sentence in enumerate(sentences, start):
+                    batch.append((relative_path, i, sentence))
+                    if len(batch) >= self.batch_size:
+                        submit(batch)
+                        batch = []
+
+            if batch:
+                submit(batch)
+
+            while in_flight:
+                self._drain(in_flight, write_queue, FIRST_COMPLETED)
+
+        write_queue.put(_DONE)
+        writer.join()
+        reader.join()
+
+        if self._error is not None:
+            raise self._error
+
+        elapsed = max(time.time() - started, 1e-9)
+        print(
+            f"Ingest pipeline: {self.total_sentences} sentences in {elapsed:.1f}s "
+            f"({self.total_sentences / elapsed:.1f} sentences/s, {self.workers} encoders)"
+        )
+        return self.total_sentences
+
+    def _drain(self, in_flight, write_queue, return_when):
+        done, _ = wait(in_flight, return_when=return_when)
+        for future in done:
+            in_flight.discard(future)
+            write_queue.put(("batch", future.items, future.result()))
+
+    # Stages
+
+    def _read(self, files, file_queue):
+        try:
+            for relative_path, path, shard in files:
+                file_queue.put(("begin", CorpusFile(
+                    relative_path=relative_path,
+                    path=path,
+                    sha256=file_sha256(path),
+                    shard=shard if self.router else ""
+                )))
+
+                count = 0
+                for sentences in self.read_batches(path, self.batch_size):
+                    file_queue.put(("sentences", relative_path, count, sentences))
+                    count += len(sentences)
+
+                file_queue.put(("end", relative_path, count))
+        except Exception as e:
+            self._error = e
+        finally:
+            file_queue.put(_DONE)
+
+    def _write(self, write_queue):
+        while True:
+            message = write_queue.get()
+            if message is _DONE:
+                return
+            if self._error is not None:
+                continue
+
+            try:
+                if message[0] == "begin":
+                    self._begin_file(message[1])
+                elif message[0] == "end":
+                    self._end_file(message[1], message[2])
+                else:
+                    self._write_batch(message[1], message[2])
+            except Exception as e:
+                self._error = e
+
+    def _begin_file(self, corpus_file: CorpusFile):
+        print(f"Reading {corpus_file.relative_path}")
+        self.remove_file_rows(
+            self._collection_for(corpus_file.shard), self.exact_collection, corpus_file.relative_path
+        )
+        self._files[corpus_file.relative_path] = corpus_file
+
+    def _end_file(self, relative_path: str, sentences: int):
+        corpus_file = self._files[relative_path]
+        corpus_file.sentences = sentences
+        corpus_file.complete = True
+
+        if not sentences:
+            print(f" No sentences found in {corpus_file.path.name}")
+        self._maybe_finish_file(corpus_file)
+
+    def _write_batch(self, items, embeddings: np.ndarray):
+        embedding_lists = embeddings.tolist()
+        by_file = {}
+        by_shard = {}
+
+        for (relative_path, i, sentence), embedding in zip(items, embedding_lists):
+            # A batch can span files living in different shards
+            shard = self._files[relative_path].shard
+            ids, documents, metadatas, shard_embeddings = by_shard.setdefault(shard, ([], [], [], []))
+
+            # GLOBAL UNIQUE IDS
+            ids.append(f"{relative_path}_{i}")
+            documents.append(sentence)
+            metadatas.append({"source": relative_path, "type": "corpus"})
+            shard_embeddings.append(embedding)
+
+            sentences, file_embeddings = by_file.setdefault(relative_path, ([], []))
+            sentences.append(sentence)
+            file_embeddings.append(embedding)
+
+        for shard, (ids, documents, metadatas, shard_embeddings) in by_shard.items():
+            self._collection_for(shard).upsert(
+                ids=ids,
+                documents=documents,
+                embeddings=shard_embeddings,
+                metadatas=metadatas
+            )
+
+        for relative_path, (sentences, file_embeddings) in by_file.items():
+            # Hash index for the exact-match first stage
+            ingest_corpus_sentences(
+                self.exact_collection,
+                sentences,
+                document_id=relative_path,
+                embeddings=file_embeddings
+            )
+
+            corpus_file = self._files[relative_path]
+            corpus_file.written += len(sentences)
+            self._maybe_finish_file(corpus_file)
+
+        self.total_sentences += len(items)
+
+    def _maybe_finish_file(self, corpus_file: CorpusFile):
+        # Encoded batches can land after the reader's end marker
+        if not corpus_file.complete or corpus_file.written < corpus_file.sentences:
+            return
+
+        del self._files[corpus_file.relative_path]
+
+        # Checkpoint: this file is done even if the run dies later
+        self.manifest.record(
+            corpus_file.relative_path,
+            corpus_file.path,
+            corpus_file.sentences,
+            corpus_file.sha256,
+            shard=corpus_file.shard if self.router else None
+        )
+        self.manifest.save()
+        print(f"Ingested {corpus_file.sentences} sentences from {corpus_file.path.name}")
+
+    def _collection_for(self, shard: str):
+        if self.router is None:
+            return self.collection
+        return self.router.collection(shard)
+
+
+# Encoder processes
+
+def _init_encoder(workers: int):
+    # Split the cores between encoder processes instead of oversubscribing
+    import torch
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+
+def _encode_batch(sentences: List[str]) -> np.ndarray:
+    from app.services.analysis.model_registry import get_model
+
+    return np.asarray(
+        get_model(EMBEDDING_MODEL_NAME).encode(
+            sentences,
+            batch_size=EMBED_BATCH_SIZE,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ),
+        dtype=np.float32
+    )
@@ -0,0 +1,63 @@
+# app/services/analysis/model_registry.py
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+
+from sentence_transformers import SentenceTransformer
+
+from app.core.config import EMBEDDING_MODEL_NAME, PARAPHRASE_MODEL_NAME, MODEL_BACKENDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODELS = (EMBEDDING_MODEL_NAME, PARAPHRASE_MODEL_NAME)
+
+# SentenceTransformer, or an OnnxSentenceEncoder with the same encode()
+_models: Dict[str, SentenceTransformer] = {}
+_lock = threading.Lock()
+
+
+def get_model(name: str) -> SentenceTransformer:
+    """
+    Return the process-wide instance of `name`, loading it on first use.
+    Concurrent first callers wait for a single load.
+    """
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(name)
+        if model is None:
+            model = _load(name)
+            _models[name] = model
+        return model
+
+
+def _load(name: str):
+    backend = MODEL_BACKENDS.get(name, "torch")
+
+    if backend == "onnx":
+        from app.services.analysis.onnx_encoder import OnnxSentenceEncoder, has_onnx_export
+
+        if has_onnx_export(name):
+            logger.info("Loading model %s (onnx)", name)
+            try:
+                return OnnxSentenceEncoder(name)
+            except ImportError as e:
+                logger.warning(
+                    "ONNX backend for %s unavailable (%s); install requirements-onnx.txt. Using torch",
+                    name, e,
+                )
+        else:
+            logger.warning("No ONNX export for %s; run export_onnx_models.py. Using torch", name)
+
+    elif backend != "torch":
+        raise ValueError(f"Unsupported model backend for {name}: {backend}")
+
+    logger.info("Loading model %s", name)
+    return SentenceTransformer(name)
+
+
+def warm_up_models(names: Optional[Iterable[str]] = None):
+    for name in names or DEFAULT_MODELS:
+        get_model(name)
@@ -0,0 +1,205 @@
+# app/services/analysis/onnx_encoder.py
+import json
+import logging
+import os
+from typing import Dict, List, Union
+
+import numpy as np
+
+from app.core.config import ONNX_MODEL_PATH, ONNX_QUANTIZED, ONNX_THREADS
+
+logger = logging.getLogger(__name__)
+
+_CONFIG_FILE = "export.json"
+_MODEL_FILE = "model.onnx"
+_QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+
+class OnnxSentenceEncoder:
+    """
+    ONNX Runtime stand-in for SentenceTransformer.encode on CPU.
+
+    Runs the exported transformer and applies the same pooling and
+    normalisation as the sentence-transformers pipeline. Sentences are
+    sorted by token length before batching, so each batch pads to
+    roughly its own length instead of the longest sentence overall.
+    """
+
+    def __init__(self, name: str, quantized: bool = ONNX_QUANTIZED, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = onnx_model_dir(name)
+        with open(os.path.join(model_dir, _CONFIG_FILE), encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        model_file = _QUANTIZED_MODEL_FILE if quantized else _MODEL_FILE
+        if quantized and not os.path.exists(os.path.join(model_dir, model_file)):
+            logger.warning("No quantized ONNX export for %s, using float32", name)
+            model_file = _MODEL_FILE
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or _torch_threads()
+        options.inter_op_num_threads = 1
+
+        self.name = name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.max_seq_length = self.config["max_seq_length"]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dim"]
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        convert_to_tensor: bool = False,
+        **kwargs
+    ):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        embeddings = np.zeros((len(sentences), self.config["dim"]), dtype=np.float32)
+
+        if sentences:
+            encoded = self.tokenizer(
+                list(sentences),
+                truncation=True,
+                max_length=self.max_seq_length
+            )
+            order = np.argsort([len(ids) for ids in encoded["input_ids"]], kind="stable")
+
+            for start in range(0, len(order), batch_size):
+                rows = order[start:start + batch_size]
+                embeddings[rows] = self._run({
+                    "input_ids": [encoded["input_ids"][r] for r in rows],
+                    "attention_mask": [encoded["attention_mask"][r] for r in rows],
+                })
+
+        if normalize_embeddings or self.config["normalize"]:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+
+        if single:
+            embeddings = embeddings[0]
+
+        if convert_to_tensor:
+            import torch
+            return torch.from_numpy(embeddings)
+        return embeddings
+
+    def _run(self, features: Dict[str, List[List[int]]]) -> np.ndarray:
+        batch = self.tokenizer.pad(features, return_tensors="np")
+        input_ids = batch["input_ids"].astype(np.int64)
+        attention_mask = batch["attention_mask"].astype(np.int64)
+
+        token_embeddings = self.session.run(
+            None,
+            {"input_ids": input_ids, "attention_mask": attention_mask}
+        )[0]
+        return _pool(token_embeddings, attention_mask, self.config["pooling"])
+
+
+def _pool(token_embeddings: np.ndarray, attention_mask: np.ndarray, mode: str) -> np.ndarray:
+    if mode == "cls":
+        return token_embeddings[:, 0]
+
+    mask = attention_mask[:, :, None].astype(np.float32)
+    if mode == "max":
+        return np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+
+    summed = (token_embeddings * mask).sum(axis=1)
+    return summed / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+def _torch_threads() -> int:
+    # Follows torch.set_num_threads, e.g. the ingest encoder processes' share
+    try:
+        import torch
+        return torch.get_num_threads()
+    except ImportError:
+        return 0
+
+
+# Export (offline, needs torch + onnxruntime)
+
+def onnx_model_dir(name: str) -> str:
+    return os.path.join(ONNX_MODEL_PATH, name.replace("/", "__"))
+
+
+def has_onnx_export(name: str) -> bool:
+    return os.path.exists(os.path.join(onnx_model_dir(name), _CONFIG_FILE))
+
+
+def export_onnx_model(name: str, quantize: bool = True, opset: int = 14) -> str:
+    """
+    Export the transformer of sentence-transformers model `name` to ONNX,
+    plus a dynamically int8-quantized copy. Returns the export directory.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    model = SentenceTransformer(name, device="cpu")
+    model.eval()
+    transformer = model[0]
+
+    pooling = next(m for m in model if isinstance(m, Pooling))
+    config = {
+        "model_name": name,
+        "dim": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "pooling": pooling.get_pooling_mode_str(),
+        "normalize": any(isinstance(m, Normalize) for m in model),
+    }
+    if config["pooling"] not in ("mean", "cls", "max"):
+        raise ValueError(f"Unsupported pooling mode for ONNX export: {config['pooling']}")
+
+    class _TokenEmbeddings(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, input_ids, attention_mask):
+            return self.auto_model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    model_dir = onnx_model_dir(name)
+    os.makedirs(model_dir, exist_ok=True)
+    model_path = os.path.join(model_dir, _MODEL_FILE)
+
+    sample = transformer.tokenizer(["An example sentence."], return_tensors="pt")
+    dynamic_axes = {"input_ids": {0: "batch", 1: "tokens"}, "attention_mask": {0: "batch", 1: "tokens"}}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            _TokenEmbeddings(transformer.auto_model),
+            (sample["input_ids"], sample["attention_mask"]),
+            model_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["token_embeddings"],
+            dynamic_axes=dict(dynamic_axes, token_embeddings={0: "batch", 1: "tokens"}),
+            opset_version=opset
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(
+            model_path,
+            os.path.join(model_dir, _QUANTIZED_MODEL_FILE),
+            weight_type=QuantType.QInt8
+        )
+
+    transformer.tokenizer.save_pretrained(model_dir)
+    with open(os.path.join(model_dir, _CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    return model_dir
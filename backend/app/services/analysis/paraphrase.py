@@ -1,11 +1,36 @@
 from app.db.chroma_collections import get_collection
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer, util
+from typing import List, Dict, Optional
+import numpy as np
+from sentence_transformers import util
+
+from app.core.config import (
+    PARAPHRASE_MODEL_NAME,
+    EMBED_BATCH_SIZE,
+    QUANTIZED_RERANK,
+    QUANTIZED_RERANK_FACTOR,
+)
+from app.services.analysis.model_registry import get_model
+from app.services.analysis.embedding_batcher import encode_sentences
+from app.db.corpus_shards import iter_collection_pages
+from app.services.analysis.embedding_store import (
+    CorpusEmbeddingStore,
+    EmbeddingStoreWriter,
+    encode_reusing_previous,
+    get_embedding_store,
+    load_embedding_store,
+)
 
 PARAPHRASE_THRESHOLD = 0.75
 SEMANTIC_UPPER_BOUND = 0.85
 TOP_K = 5
 
+# Max similarity-matrix cells materialised at once in detect_batch
+_MAX_BLOCK_ELEMENTS = 1 << 24
+
+# Band widening applied to quantized scores before the exact re-rank,
+# so borderline matches are not lost to quantization error
+_QUANTIZATION_MARGIN = 0.02
+
 def detect_paraphrase(embedding):
     collection = get_collection("corpus_plagiarism")
 
@@ -16,17 +41,213 @@ def detect_paraphrase(embedding):
 
 class ParaphraseDetector:
 
-    def __init__(self):
-        self.model = SentenceTransformer("paraphrase-mpnet-base-v2")
+    def __init__(self, store: Optional[CorpusEmbeddingStore] = None):
+        # Precomputed corpus embeddings, built by ingest.py
+        self.store = store or get_embedding_store(PARAPHRASE_MODEL_NAME)
+
+    def use_corpus(self, corpus_sentences: List[str], ids: Optional[List[str]] = None):
+        """Encode an ad-hoc corpus once, when no prebuilt store exists."""
+        self.store = CorpusEmbeddingStore.from_sentences(
+            self.model, PARAPHRASE_MODEL_NAME, corpus_sentences, ids=ids
+        )
+
+    @property
+    def model(self):
+        # Only the ad-hoc corpus paths encode here; queries go through the
+        # batcher, so the model is not loaded just to build a detector
+        return get_model(PARAPHRASE_MODEL_NAME)
 
     def detect(
+        self,
+        sentence_id: int,
+        sentence: str,
+        corpus_sentences: Optional[List[str]] = None
+    ) -> List[Dict]:
+
+        if not sentence.strip():
+            return []
+
+        if corpus_sentences is not None:
+            return self._detect_against_sentences(
+                sentence_id, sentence, corpus_sentences
+            )
+
+        return self.detect_batch([sentence], start_id=sentence_id)
+
+    def detect_batch(
+        self,
+        sentences: List[str],
+        start_id: int = 0,
+        batch_size: int = EMBED_BATCH_SIZE
+    ) -> List[Dict]:
+        """
+        Score every sentence against the whole corpus matrix and keep the
+        TOP_K best paraphrase-band matches per sentence.
+        """
+        if self.store is None or len(self.store) == 0:
+            return []
+
+        positions = [i for i, s in enumerate(sentences) if s.strip()]
+        if not positions:
+            return []
+
+        query_embeddings = self._encode(
+            [sentences[i] for i in positions], batch_size
+        )
+
+        results = []
+        rerank = QUANTIZED_RERANK and self.store.codes is not None
+
+        # Bound the (rows x corpus) similarity block held in memory
+        rows_per_block = max(1, _MAX_BLOCK_ELEMENTS // len(self.store))
+
+        for start in range(0, len(positions), rows_per_block):
+            block = query_embeddings[start:start + rows_per_block]
+
+            # Rows are normalised, so this is cosine similarity
+            similarities = self.store.similarities(block)
+            if rerank:
+                top_idx, top_scores = self._rerank(block, similarities)
+            else:
+                top_idx, top_scores = select_band_top_k(similarities)
+
+            for row in range(len(block)):
+                sentence_id = start_id + positions[start + row]
+                results.extend(
+                    self._to_results(
+                        sentence_id,
+                        top_idx[row],
+                        top_scores[row],
+                        self.store.documents
+                    )
+                )
+
+        return results
+
+    def detect_candidates(
+        self,
+        sentences: List[str],
+        candidate_ids: List[List[str]],
+        start_id: int = 0,
+        batch_size: int = EMBED_BATCH_SIZE,
+        candidate_documents: Optional[List[List[str]]] = None
+    ) -> List[Dict]:
+        """
+        Second stage of the cascade: score each sentence only against its
+        retrieved candidates (corpus ids, e.g. from the MiniLM search)
+        instead of the whole corpus.
+
+        Without a prebuilt store the candidates' own texts
+        (`candidate_documents`) are encoded instead.
+        """
+        if self.store is None or len(self.store) == 0:
+            if candidate_documents is None:
+                return []
+            return self._detect_against_candidate_texts(
+                sentences, candidate_documents, start_id, batch_size
+            )
+
+        positions = [
+            i for i, s in enumerate(sentences)
+            if s.strip() and candidate_ids[i]
+        ]
+        if not positions:
+            return []
+
+        query_embeddings = self._encode(
+            [sentences[i] for i in positions], batch_size
+        )
+
+        results = []
+        for query, position in zip(query_embeddings, positions):
+            rows = self.store.rows_for(candidate_ids[position])
+            if len(rows) == 0:
+                continue
+
+            similarities = self.store.exact_similarities(query[None, :], rows)
+            top_idx, top_scores = select_band_top_k(similarities)
+
+            results.extend(
+                self._to_results(
+                    start_id + position,
+                    rows[top_idx[0]],
+                    top_scores[0],
+                    self.store.documents
+                )
+            )
+
+        return results
+
+    def _detect_against_candidate_texts(self, sentences, candidate_documents, start_id, batch_size):
+        positions = [
+            i for i, s in enumerate(sentences)
+            if s.strip() and candidate_documents[i]
+        ]
+        if not positions:
+            return []
+
+        query_embeddings = self._encode([sentences[i] for i in positions], batch_size)
+
+        # Candidates shared between sentences are encoded once (and cached)
+        texts = list(dict.fromkeys(
+            doc for i in positions for doc in candidate_documents[i]
+        ))
+        text_rows = {doc: row for row, doc in enumerate(texts)}
+        text_embeddings = self._encode(texts, batch_size)
+
+        results = []
+        for query, position in zip(query_embeddings, positions):
+            docs = list(dict.fromkeys(candidate_documents[position]))
+            rows = [text_rows[doc] for doc in docs]
+            similarities = query[None, :] @ text_embeddings[rows].T
+            top_idx, top_scores = select_band_top_k(similarities)
+            results.extend(
+                self._to_results(start_id + position, top_idx[0], top_scores[0], docs)
+            )
+
+        return results
+
+    def _encode(self, sentences: List[str], batch_size: int) -> np.ndarray:
+        # Shared batcher: concurrent analyses share mpnet forward passes
+        return encode_sentences(PARAPHRASE_MODEL_NAME, sentences, batch_size)
+
+    def _rerank(self, queries: np.ndarray, approximate: np.ndarray):
+        """
+        Shortlist in a slightly widened band on quantized scores, then apply
+        the real band and TOP_K to exact float32 scores of the shortlist.
+        """
+        candidates, candidate_scores = select_band_top_k(
+            approximate,
+            k=TOP_K * QUANTIZED_RERANK_FACTOR,
+            lower=PARAPHRASE_THRESHOLD - _QUANTIZATION_MARGIN,
+            upper=SEMANTIC_UPPER_BOUND + _QUANTIZATION_MARGIN
+        )
+
+        k = min(TOP_K, candidates.shape[1])
+        top_idx = np.zeros((len(queries), k), dtype=np.int64)
+        top_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+
+        for row, query in enumerate(queries):
+            rows = np.sort(candidates[row][np.isfinite(candidate_scores[row])])
+            if len(rows) == 0:
+                continue
+
+            exact = self.store.exact_similarities(query[None, :], rows)
+            idx, scores = select_band_top_k(exact, k=k)
+            found = min(k, idx.shape[1])
+            top_idx[row, :found] = rows[idx[0]]
+            top_scores[row, :found] = scores[0]
+
+        return top_idx, top_scores
+
+    def _detect_against_sentences(
         self,
         sentence_id: int,
         sentence: str,
         corpus_sentences: List[str]
     ) -> List[Dict]:
 
-        if not sentence.strip() or not corpus_sentences:
+        if not corpus_sentences:
             return []
 
         # Encode query & corpus
@@ -34,23 +255,94 @@ class ParaphraseDetector:
         corpus_embeddings = self.model.encode(corpus_sentences, convert_to_tensor=True)
 
         # Compute cosine similarity
-        similarities = util.cos_sim(query_embedding, corpus_embeddings)[0]
+        similarities = util.cos_sim(query_embedding, corpus_embeddings).cpu().numpy()
+        top_idx, top_scores = select_band_top_k(similarities)
 
-        results = []
+        return self._to_results(
+            sentence_id, top_idx[0], top_scores[0], corpus_sentences
+        )
+
+    def _to_results(self, sentence_id, indices, scores, corpus_sentences) -> List[Dict]:
+        return [
+            {
+                "sentence_id": sentence_id,
+                "type": "paraphrase",
+                "confidence": round(float(score), 3),
+                "matched_sentence": corpus_sentences[idx]
+            }
+            for idx, score in zip(indices, scores)
+            if np.isfinite(score)
+        ]
+
+
+def select_band_top_k(
+    similarities: np.ndarray,
+    k: int = TOP_K,
+    lower: float = PARAPHRASE_THRESHOLD,
+    upper: float = SEMANTIC_UPPER_BOUND
+):
+    """
+    Per row, the indices and scores of the k highest similarities inside
+    the paraphrase band, best first. Rows with fewer than k in-band hits
+    are padded with -inf scores.
+    """
+    similarities = np.atleast_2d(similarities)
+    k = min(k, similarities.shape[1])
+
+    # Paraphrase band
+    in_band = (similarities >= lower) & (similarities < upper)
+    masked = np.where(in_band, similarities, -np.inf)
+
+    top_idx = np.argpartition(-masked, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(masked, top_idx, axis=1)
+
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return (
+        np.take_along_axis(top_idx, order, axis=1),
+        np.take_along_axis(top_scores, order, axis=1)
+    )
+
+
+class ParaphraseStoreBuilder:
+    """
+    New paraphrase-model store version, built one corpus page at a time.
+    Rows the current version already holds (same id, same sentence) are
+    copied from it instead of re-encoded.
+    """
+
+    def __init__(self, count: int, batch_size: int = 64):
+        self.model = get_model(PARAPHRASE_MODEL_NAME)
+        self.batch_size = batch_size
+        self.previous = load_embedding_store(PARAPHRASE_MODEL_NAME)
+        self.writer = EmbeddingStoreWriter(PARAPHRASE_MODEL_NAME, count)
+        self.encoded = 0
 
-        for idx, score in enumerate(similarities):
-            confidence = float(score)
+    def append(self, ids: List[str], documents: List[str], sources: List[str]):
+        embeddings, encoded = encode_reusing_previous(
+            self.model, self.previous, ids, documents, self.batch_size
+        )
+        self.writer.append(ids, documents, sources, embeddings)
+        self.encoded += encoded
 
-            # Paraphrase band
-            if PARAPHRASE_THRESHOLD <= confidence < SEMANTIC_UPPER_BOUND:
-                results.append({
-                    "sentence_id": sentence_id,
-                    "type": "paraphrase",
-                    "confidence": round(confidence, 3),
-                    "matched_sentence": corpus_sentences[idx]
-                })
+    def publish(self) -> str:
+        version = self.writer.publish()
+        print(
+            f"Embedding store [{PARAPHRASE_MODEL_NAME}]: encoded {self.encoded}, "
+            f"reused {self.writer.rows - self.encoded}"
+        )
+        return version
 
-            if len(results) >= TOP_K:
-                break
 
-        return results
\ No newline at end of file
+def build_paraphrase_store(collection) -> str:
+    """
+    Encode every corpus sentence with the paraphrase model and publish
+    a new store version. Called once at ingest time.
+    """
+    builder = ParaphraseStoreBuilder(collection.count())
+    for page in iter_collection_pages(collection, include=["documents", "metadatas"]):
+        builder.append(
+            page["ids"],
+            page["documents"],
+            [(meta or {}).get("source", "Unknown") for meta in page["metadatas"]]
+        )
+    return builder.publish()
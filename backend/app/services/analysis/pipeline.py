@@ -0,0 +1,410 @@
+# app/services/analysis/pipeline.py
+import hashlib
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import (
+    STREAM_CHUNK_SIZE,
+    RESULT_CACHE_ENABLED,
+    EMBEDDING_MODEL_NAME,
+    PARAPHRASE_MODEL_NAME,
+    NEAR_DUPLICATE_THRESHOLD,
+    PARAPHRASE_MODE,
+    PARAPHRASE_CANDIDATES,
+    MODEL_BACKENDS,
+    ONNX_QUANTIZED,
+    COHORT_INDEX_ENABLED,
+)
+from app.db.chroma_client import ChromaSearchClient
+from app.db.corpus_shards import ShardedCollectionView, get_corpus_shards
+from app.db.corpus_version import get_corpus_version
+from app.db.vector_backends import get_vector_backend
+
+from app.services.analysis.embedding_batcher import encode_sentences
+from app.services.analysis.text_similarity import segment_sentences
+from app.services.analysis.text_similarity import (
+    SemanticSimilarityService,
+    SIMILARITY_THRESHOLD,
+    EXACT_MATCH_THRESHOLD,
+    SEMANTIC_TOP_K,
+)
+from app.services.analysis.paraphrase import (
+    ParaphraseDetector,
+    PARAPHRASE_THRESHOLD,
+    SEMANTIC_UPPER_BOUND,
+    TOP_K,
+)
+from app.services.cache.result_cache import get_result_cache
+from app.services.plagiarism.exact_match import (
+    check_exact_match,
+    get_exact_match_collection,
+)
+from app.services.plagiarism.cohort_index import CohortIndex
+from app.services.plagiarism.near_duplicate import get_near_duplicate_index
+from app.services.preprocessing.normalize import normalize_and_hash
+from app.services.scoring.scoring import compute_originality_score
+from app.services.storage.file_store import FileStore, UPLOADS_DIR as FILE_STORE_UPLOADS_DIR
+from app.services.report.report_builder import build_report
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIR = Path(FILE_STORE_UPLOADS_DIR)
+
+# progress(stage, fraction_done)
+ProgressCallback = Callable[[str, float], None]
+
+
+def extracted_text_path(assignment_id: str) -> Path:
+    return UPLOADS_DIR / assignment_id / "extracted.txt"
+
+
+def load_sentences(assignment_id: str) -> List[str]:
+    extracted_path = extracted_text_path(assignment_id)
+
+    if not extracted_path.exists():
+        raise FileNotFoundError(f"Extracted text not found for {assignment_id}")
+
+    text = extracted_path.read_text(encoding="utf-8")
+    return segment_sentences(text)
+
+
+def get_corpus_collection():
+    """The corpus collection, or a read-only view over all of its shards."""
+    shards = get_corpus_shards()
+    if len(shards) == 1:
+        return next(iter(shards.values()))
+    return ShardedCollectionView(shards)
+
+
+def analyze_assignment(
+    assignment_id: str,
+    progress: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """Full analysis of an uploaded assignment: flags, score and report."""
+    progress = progress or _no_progress
+
+    progress("loading", 0.0)
+    sentences = load_sentences(assignment_id)
+
+    stages = AnalysisStages()
+
+    # Whole-document cache: identical resubmissions skip every stage. The
+    # key is over normalised sentences, so flags are stored without their
+    # sentence text and this submission's own text is put back on a hit
+    document_key = stages.document_key(sentences)
+    cached_items = stages.cache.get(document_key)
+
+    if cached_items is None:
+        flagged_items = stages.run(sentences, progress=progress)
+        stages.cache.set(document_key, [
+            {k: v for k, v in item.items() if k != "sentence"} for item in flagged_items
+        ])
+    else:
+        flagged_items = [
+            dict(item, sentence=sentences[item["sentence_id"]]) for item in cached_items
+        ]
+
+    # Cohort check: changes with every submission, so never cached
+    cohort = get_submission_cohort(assignment_id)
+    if cohort is not None:
+        progress("cohort", 0.85)
+        index, student_id = cohort
+        embeddings = encode_sentences(EMBEDDING_MODEL_NAME, sentences)
+        flagged_items = flagged_items + index.check(
+            sentences, embeddings, assignment_id=assignment_id, student_id=student_id
+        )
+        index.insert(assignment_id, sentences, embeddings, student_id=student_id)
+
+    # Scoring
+    progress("scoring", 0.9)
+    score = compute_originality_score(
+        total_sentences=len(sentences),
+        flagged_items=flagged_items
+    )
+
+    # Final report
+    report = build_report(
+        assignment_id=assignment_id,
+        sentences=sentences,
+        flagged_items=flagged_items,
+        score=score
+    )
+
+    progress("done", 1.0)
+
+    return {
+        "assignment_id": assignment_id,
+        "report": report
+    }
+
+
+def iter_analysis_events(
+    assignment_id: str,
+    sentences: List[str],
+    chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Analyse `sentences` chunk by chunk, yielding ("flags", ...) events as
+    soon as each chunk is scored and a final ("score", ...) event.
+
+    Only the first flag per sentence is kept for scoring, which is all
+    compute_originality_score looks at.
+    """
+    stages = AnalysisStages()
+    cohort = get_submission_cohort(assignment_id)
+
+    yield "start", {
+        "assignment_id": assignment_id,
+        "total_sentences": len(sentences)
+    }
+
+    scored_items: List[Dict[str, Any]] = []
+    seen_sentence_ids = set()
+
+    for start in range(0, len(sentences), chunk_size):
+        chunk = sentences[start:start + chunk_size]
+
+        flagged_items = stages.run(chunk, start_id=start)
+        if cohort is not None:
+            index, student_id = cohort
+            flagged_items = flagged_items + index.check(
+                chunk, assignment_id=assignment_id, student_id=student_id, start_id=start
+            )
+
+        for item in flagged_items:
+            item.setdefault("sentence", sentences[item["sentence_id"]])
+            if item["sentence_id"] not in seen_sentence_ids:
+                seen_sentence_ids.add(item["sentence_id"])
+                scored_items.append({
+                    "sentence_id": item["sentence_id"],
+                    "type": item["type"]
+                })
+
+        yield "flags", {
+            "processed": min(start + chunk_size, len(sentences)),
+            "items": flagged_items
+        }
+
+    if cohort is not None:
+        index, student_id = cohort
+        index.insert(assignment_id, sentences, student_id=student_id)
+
+    score = compute_originality_score(
+        total_sentences=len(sentences),
+        flagged_items=scored_items
+    )
+    yield "score", score
+
+
+def get_submission_cohort(assignment_id: str) -> Optional[Tuple[CohortIndex, str]]:
+    """(course cohort index, student_id) if the upload named a course and student."""
+    if not COHORT_INDEX_ENABLED:
+        return None
+
+    # Anonymous submissions are neither checked nor indexed: their own
+    # earlier versions could not be told apart from other students'
+    submission = FileStore().read_submission(assignment_id)
+    if not submission or not submission.get("course_id") or not submission.get("student_id"):
+        return None
+    return CohortIndex(submission["course_id"]), submission.get("student_id")
+
+
+class AnalysisStages:
+    """
+    Exact hash lookup and MinHash near-duplicate check first, then the
+    semantic + paraphrase stages behind the content-addressed result cache.
+    Sentences caught by the cheap stages, or whose normalised text is
+    cached, never reach the models.
+    """
+
+    def __init__(self):
+        # Without the shared cache, still dedupe repeated sentences per call
+        self.cache = get_result_cache() if RESULT_CACHE_ENABLED else _LocalCache()
+        self.key_prefix = _cache_key_prefix()
+        self._detectors = None
+        self._exact_collection = None
+
+    def sentence_key(self, sentence: str) -> str:
+        _, h = normalize_and_hash(sentence)
+        return _digest(f"sentence|{self.key_prefix}|{h or sentence}")
+
+    def document_key(self, sentences: List[str]) -> str:
+        hashes = "|".join(normalize_and_hash(s)[1] for s in sentences)
+        return _digest(f"document|{self.key_prefix}|{hashes}")
+
+    def run(
+        self,
+        sentences: List[str],
+        start_id: int = 0,
+        progress: Optional[ProgressCallback] = None
+    ) -> List[Dict[str, Any]]:
+        """Flags for `sentences`: exact, near-duplicate, semantic, paraphrase."""
+        progress = progress or _no_progress
+
+        # Exact match: one bulk hash lookup for the whole batch
+        progress("exact_match", 0.05)
+        exact_matches = check_exact_match(self._get_exact_collection(), sentences)
+        resolved = {flag["sentence_id"] for flag in exact_matches}
+
+        # Near-duplicate: MinHash/LSH over word shingles, for light edits
+        near_matches = []
+        near_index = get_near_duplicate_index()
+        if near_index is not None:
+            progress("near_duplicate", 0.08)
+            remaining = [i for i in range(len(sentences)) if i not in resolved]
+            for flag in near_index.check([sentences[i] for i in remaining]):
+                flag["sentence_id"] = remaining[flag["sentence_id"]]
+                near_matches.append(flag)
+            resolved.update(flag["sentence_id"] for flag in near_matches)
+
+        for flag in exact_matches + near_matches:
+            flag["sentence_id"] += start_id
+
+        keys = [self.sentence_key(s) for s in sentences]
+        cached = self.cache.get_many(
+            {key for i, key in enumerate(keys) if i not in resolved}
+        )
+
+        # One model pass per distinct uncached sentence
+        pending: Dict[str, int] = {}
+        for i, key in enumerate(keys):
+            if i in resolved:
+                continue
+            if key not in cached and key not in pending:
+                pending[key] = i
+
+        if pending:
+            cached.update(self._analyze_uncached(sentences, pending, progress))
+
+        semantic_matches, paraphrase_matches = [], []
+        for i, (sentence, key) in enumerate(zip(sentences, keys)):
+            if i in resolved:
+                continue
+            entry = cached[key]
+            for flag in entry["semantic"]:
+                semantic_matches.append(
+                    dict(flag, sentence_id=start_id + i, sentence=sentence)
+                )
+            for flag in entry["paraphrase"]:
+                paraphrase_matches.append(dict(flag, sentence_id=start_id + i))
+
+        return exact_matches + near_matches + semantic_matches + paraphrase_matches
+
+    def _analyze_uncached(self, sentences, pending, progress):
+        keys = list(pending)
+        batch = [sentences[pending[key]] for key in keys]
+        similarity_service, paraphrase_detector = self._get_detectors()
+
+        entries = {key: {"semantic": [], "paraphrase": []} for key in keys}
+
+        cascade = PARAPHRASE_MODE == "cascade"
+
+        # Semantic similarity; in cascade mode the same MiniLM search also
+        # retrieves the paraphrase candidates
+        progress("semantic", 0.1)
+        top_k = max(SEMANTIC_TOP_K, PARAPHRASE_CANDIDATES) if cascade else SEMANTIC_TOP_K
+        matches = similarity_service.search(batch, top_k=top_k)
+        for flag in similarity_service.flag(batch, matches):
+            flag.pop("sentence", None)
+            entries[keys[flag.pop("sentence_id")]]["semantic"].append(flag)
+
+        # Paraphrase detection: mpnet over the candidates, or the whole corpus
+        progress("paraphrase", 0.5)
+        if cascade:
+            paraphrase_flags = paraphrase_detector.detect_candidates(
+                batch, matches["ids"], candidate_documents=matches["documents"]
+            )
+        else:
+            paraphrase_flags = paraphrase_detector.detect_batch(batch)
+        for flag in paraphrase_flags:
+            entries[keys[flag.pop("sentence_id")]]["paraphrase"].append(flag)
+
+        self.cache.set_many(entries)
+        return entries
+
+    def _get_exact_collection(self):
+        if self._exact_collection is None:
+            self._exact_collection = get_exact_match_collection()
+        return self._exact_collection
+
+    def _get_detectors(self):
+        if self._detectors is None:
+            self._detectors = _build_detectors(get_corpus_collection())
+        return self._detectors
+
+
+class _LocalCache(dict):
+    def get_many(self, keys):
+        return {key: self[key] for key in keys if key in self}
+
+    def set_many(self, items):
+        self.update(items)
+
+    def set(self, key, value):
+        self[key] = value
+
+
+def _cache_key_prefix() -> str:
+    """Corpus version + everything that changes what a stage would flag."""
+    config = {
+        "corpus": get_corpus_version(),
+        "models": [EMBEDDING_MODEL_NAME, PARAPHRASE_MODEL_NAME],
+        "model_backends": [MODEL_BACKENDS, ONNX_QUANTIZED],
+        "semantic": [SIMILARITY_THRESHOLD, EXACT_MATCH_THRESHOLD],
+        "paraphrase": [PARAPHRASE_THRESHOLD, SEMANTIC_UPPER_BOUND, TOP_K],
+        "paraphrase_mode": [PARAPHRASE_MODE, PARAPHRASE_CANDIDATES],
+        "near_duplicate": NEAR_DUPLICATE_THRESHOLD,
+    }
+    return _digest(json.dumps(config, sort_keys=True))[:16]
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _build_detectors(corpus_collection):
+    chroma_search = ChromaSearchClient(
+        corpus_collection,
+        backend=get_vector_backend(get_corpus_shards())
+    )
+    similarity_service = SemanticSimilarityService(chroma_search)
+
+    paraphrase_detector = ParaphraseDetector()
+    if paraphrase_detector.store is None:
+        if PARAPHRASE_MODE == "cascade":
+            # Candidates carry their text, so only matched sentences get encoded
+            logger.warning("Paraphrase embedding store not built; run ingest.py. Encoding candidates per request")
+        else:
+            _use_adhoc_corpus(paraphrase_detector, corpus_collection)
+
+    return similarity_service, paraphrase_detector
+
+
+# Whole-corpus paraphrase embeddings when ingest built no store:
+# encoded once per process and corpus version, not per request
+_adhoc_store = None
+_adhoc_version: Optional[str] = None
+_adhoc_lock = threading.Lock()
+
+
+def _use_adhoc_corpus(paraphrase_detector: ParaphraseDetector, corpus_collection):
+    global _adhoc_store, _adhoc_version
+
+    version = get_corpus_version()
+    with _adhoc_lock:
+        if _adhoc_store is None or _adhoc_version != version:
+            logger.warning(
+                "Paraphrase embedding store not built; run ingest.py. Encoding the corpus once for this process"
+            )
+            corpus = corpus_collection.get(include=["documents"])
+            paraphrase_detector.use_corpus(corpus["documents"], ids=corpus["ids"])
+            _adhoc_store, _adhoc_version = paraphrase_detector.store, version
+        else:
+            paraphrase_detector.store = _adhoc_store
+
+
+def _no_progress(stage: str, fraction: float):
+    pass
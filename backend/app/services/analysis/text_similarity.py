@@ -1,7 +1,9 @@
 # app/services/analysis/text_similarity.py
 from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
 import re
+from app.core.config import EMBED_BATCH_SIZE, QUERY_BATCH_SIZE, EMBEDDING_MODEL_NAME
+from app.services.analysis.model_registry import get_model
+from app.services.analysis.embedding_batcher import encode_sentences
 from app.services.analysis.paraphrase import ParaphraseDetector
 
 _SENTENCE_SPLIT_REGEX = re.compile(r'(?<=[.!?])\s+')
@@ -11,18 +13,22 @@ def segment_sentences(text: str) -> List[str]:
 
 
 class EmbeddingService:
-    def __init__(self):
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+    # Goes through the shared embedding batcher, so concurrent analyses
+    # share forward passes; the model itself is loaded by the batcher
+    @property
+    def model(self):
+        return get_model(EMBEDDING_MODEL_NAME)
 
     def embed(self, sentence: str) -> list[float]:
-        return self.model.encode(
-            sentence,
-            normalize_embeddings=True
-        ).tolist()
+        return encode_sentences(EMBEDDING_MODEL_NAME, [sentence])[0].tolist()
+
+    def embed_batch(self, sentences: List[str], batch_size: int = EMBED_BATCH_SIZE) -> list[list[float]]:
+        return encode_sentences(EMBEDDING_MODEL_NAME, sentences, batch_size).tolist()
 
 
 SIMILARITY_THRESHOLD = 0.72 
 EXACT_MATCH_THRESHOLD = 0.90
+SEMANTIC_TOP_K = 3
 
 
 class SemanticSimilarityService:
@@ -30,32 +36,49 @@ class SemanticSimilarityService:
         self.chroma = chroma_client
         self.embedder = EmbeddingService()
 
-        count = self.chroma.collection.count()
+        count = self.chroma.count()
         if count == 0:
             raise RuntimeError("Corpus collection is EMPTY")
 
-    def analyze(self, sentences: List[str]) -> List[Dict[str, Any]]:
-        results: List[Dict[str, Any]] = []
+    def analyze(self, sentences: List[str], start_id: int = 0) -> List[Dict[str, Any]]:
+        # early exit for empty input
+        if not sentences:
+            return []
 
+        return self.flag(sentences, self.search(sentences), start_id=start_id)
+
+    def search(self, sentences: List[str], top_k: int = SEMANTIC_TOP_K) -> Dict[str, List]:
+        """Nearest corpus sentences per input sentence, best first."""
         # check corpus ONCE
-        corpus_count = self.chroma.collection.count()
+        corpus_count = self.chroma.count()
         if corpus_count == 0:
             raise RuntimeError("Corpus collection is EMPTY")
 
-        # early exit for empty input
-        if not sentences:
-            return results
+        # one batched encode + chunked multi-vector queries
+        embeddings = self.embedder.embed_batch(sentences)
+        return self.chroma.query_batch(
+            embeddings, top_k=top_k, chunk_size=QUERY_BATCH_SIZE
+        )
 
-        for idx, sentence in enumerate(sentences):
-            embedding = self.embedder.embed(sentence)
-            matches = self.chroma.query(embedding, top_k=3)
+    def flag(
+        self,
+        sentences: List[str],
+        matches: Dict[str, List],
+        start_id: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Semantic flags from search() results. Only the SEMANTIC_TOP_K best
+        matches count, so a wider candidate search gives the same flags.
+        """
+        results: List[Dict[str, Any]] = []
 
+        for idx, sentence in enumerate(sentences):
             flagged_matches = []
 
             for doc, meta, dist in zip(
-                matches["documents"][0],
-                matches["metadatas"][0],
-                matches["distances"][0],
+                matches["documents"][idx][:SEMANTIC_TOP_K],
+                matches["metadatas"][idx][:SEMANTIC_TOP_K],
+                matches["distances"][idx][:SEMANTIC_TOP_K],
             ):
                 similarity = 1 - dist
 
@@ -82,7 +105,7 @@ class SemanticSimilarityService:
             )
 
             results.append({
-                "sentence_id": idx,
+                "sentence_id": start_id + idx,
                 "sentence": sentence,
                 "type": flag_type,
                 "confidence": best["similarity"],
@@ -92,19 +115,12 @@ class SemanticSimilarityService:
 
         return results
     
-paraphrase_detector = ParaphraseDetector()
-
 def run_paraphrase_analysis(sentences, corpus_sentences):
-    paraphrase_results = []
+    paraphrase_detector = ParaphraseDetector()
 
-    for idx, sentence in enumerate(sentences):
-        matches = paraphrase_detector.detect(
-            sentence_id=idx,
-            sentence=sentence,
-            corpus_sentences=corpus_sentences
-        )
-        paraphrase_results.extend(matches)
+    # encode the corpus ONCE, not per sentence
+    paraphrase_detector.use_corpus(corpus_sentences)
 
-    return paraphrase_results
+    return paraphrase_detector.detect_batch(sentences)
 
 
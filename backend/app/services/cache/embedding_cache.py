@@ -0,0 +1,258 @@
+# app/services/cache/embedding_cache.py
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from app.core.config import (
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MEMORY_ITEMS,
+    EMBEDDING_CACHE_DISK_ITEMS,
+    MODEL_BACKENDS,
+    ONNX_QUANTIZED,
+)
+
+logger = logging.getLogger(__name__)
+
+_VECTORS_FILE = "vectors.npy"
+_SLOT_KEYS_FILE = "slot_keys.npy"
+_INDEX_FILE = "index.sqlite3"
+
+# SQLite bound-parameter limit is 999 on older builds
+_LOOKUP_CHUNK = 500
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of sentence embeddings for one model, keyed by the
+    normalised-sentence hash.
+
+    Memory: a size-bounded LRU of key -> vector. Disk: a fixed-capacity
+    ring of vectors in a memory-mapped .npy (the oldest slot is reused once
+    full) with the key -> slot index in SQLite, shared by every process.
+    Each slot also stores a tag of its key, checked around the read, so a
+    slot recycled by another process mid-read counts as a miss.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS,
+        max_disk_items: int = EMBEDDING_CACHE_DISK_ITEMS
+    ):
+        self._dir = os.path.join(path, namespace)
+        os.makedirs(self._dir, exist_ok=True)
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._max_memory_items = max_memory_items
+        self._max_disk_items = max_disk_items
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._vectors = None
+        self._slot_keys = None
+
+        # Autocommit; writers take BEGIN IMMEDIATE to serialise slot allocation
+        self._db = sqlite3.connect(
+            os.path.join(self._dir, _INDEX_FILE),
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_slot ON entries (slot)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._open_disk()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        keys = set(keys)
+        found: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            self.memory_hits += len(found)
+
+            rest = [key for key in keys if key not in found]
+            if rest and self._vectors is None:
+                # Another process may have created the disk tier since
+                self._open_disk()
+
+            if rest and self._vectors is not None:
+                for key, vector in self._read_disk(rest).items():
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+
+        with self._lock:
+            # Callers pass rows of their batch array: keep copies, not views
+            # that would pin the whole batch in memory
+            for key, vector in items.items():
+                self._remember(key, np.array(vector, dtype=np.float32))
+
+            dim = len(next(iter(items.values())))
+            if self._vectors is None:
+                self._open_disk(dim)
+            if self._vectors.shape[1] != dim:
+                logger.warning("Embedding cache %s holds dim %d, not %d; disk tier skipped",
+                               self._dir, self._vectors.shape[1], dim)
+                return
+
+            self._write_disk(items)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / total, 3) if total else 0.0,
+            "memory_items": len(self._memory),
+            "disk_items": self._meta("used") or 0,
+        }
+
+    def _read_disk(self, keys) -> Dict[str, np.ndarray]:
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            chunk = keys[start:start + _LOOKUP_CHUNK]
+            rows = self._db.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+
+            for key, slot in rows:
+                tag = _tag(key)
+                if not np.array_equal(self._slot_keys[slot], tag):
+                    continue
+                vector = np.array(self._vectors[slot])
+                if np.array_equal(self._slot_keys[slot], tag):
+                    found[key] = vector
+        return found
+
+    def _write_disk(self, items: Dict[str, np.ndarray]):
+        capacity = len(self._vectors)
+
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            keys = list(items)
+            known = set()
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                known.update(row[0] for row in self._db.execute(
+                    f"SELECT key FROM entries WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ))
+
+            next_slot = self._meta("next_slot") or 0
+            for key in keys:
+                if key in known:
+                    continue
+                slot = next_slot % capacity
+                next_slot += 1
+
+                self._db.execute("DELETE FROM entries WHERE slot = ?", (slot,))
+                self._slot_keys[slot] = 0
+                self._vectors[slot] = items[key]
+                self._slot_keys[slot] = _tag(key)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, slot) VALUES (?, ?)", (key, slot)
+                )
+
+            self._set_meta("next_slot", next_slot)
+            self._set_meta("used", min(next_slot, capacity))
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _open_disk(self, dim: Optional[int] = None):
+        """Map the disk tier, creating it (sized for `dim`) if needed."""
+        if self._meta("dim") is None:
+            if dim is None:
+                return
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._meta("dim") is None:
+                    np.lib.format.open_memmap(
+                        os.path.join(self._dir, _VECTORS_FILE), mode="w+",
+                        dtype=np.float32, shape=(self._max_disk_items, dim)
+                    ).flush()
+                    np.lib.format.open_memmap(
+                        os.path.join(self._dir, _SLOT_KEYS_FILE), mode="w+",
+                        dtype=np.uint64, shape=(self._max_disk_items, 2)
+                    ).flush()
+                    self._set_meta("dim", dim)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        self._vectors = np.load(os.path.join(self._dir, _VECTORS_FILE), mmap_mode="r+")
+        self._slot_keys = np.load(os.path.join(self._dir, _SLOT_KEYS_FILE), mmap_mode="r+")
+
+    def _meta(self, name: str) -> Optional[int]:
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: int):
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value)
+        )
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_memory_items:
+            self._memory.popitem(last=False)
+
+
+def _tag(key: str) -> np.ndarray:
+    # First 128 bits of the sha256 hex key; all-zero marks an empty slot
+    return np.array([int(key[:16], 16), int(key[16:32], 16)], dtype=np.uint64)
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def cache_namespace(model_name: str) -> str:
+    """Model + inference backend: ONNX/int8 vectors differ slightly from torch."""
+    backend = MODEL_BACKENDS.get(model_name, "torch")
+    if backend == "onnx" and ONNX_QUANTIZED:
+        backend = "onnx-int8"
+    return f"{model_name.replace('/', '__')}--{backend}"
+
+
+def get_embedding_cache(model_name: str) -> EmbeddingCache:
+    namespace = cache_namespace(model_name)
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = EmbeddingCache(namespace)
+        return _caches[namespace]
+
+
+def embedding_cache_stats() -> Dict[str, Dict[str, float]]:
+    with _caches_lock:
+        return {namespace: cache.stats() for namespace, cache in _caches.items()}
@@ -0,0 +1,176 @@
+# app/services/cache/result_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.config import (
+    RESULT_CACHE_PATH,
+    RESULT_CACHE_MEMORY_ITEMS,
+    RESULT_CACHE_DISK_ITEMS,
+)
+
+# Check the on-disk size only every N writes
+_EVICTION_CHECK_EVERY = 1000
+
+# Keys per SELECT ... IN (...); SQLite caps bound parameters at 999 on older builds
+_SELECT_CHUNK = 500
+
+
+class ResultCache:
+    """
+    Two-tier key/value cache for analysis results: a size-bounded
+    in-memory LRU in front of a SQLite table. Values must be JSON-serialisable.
+    """
+
+    def __init__(
+        self,
+        path: str = RESULT_CACHE_PATH,
+        max_memory_items: int = RESULT_CACHE_MEMORY_ITEMS,
+        max_disk_items: int = RESULT_CACHE_DISK_ITEMS
+    ):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._max_memory_items = max_memory_items
+        self._max_disk_items = max_disk_items
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        # Shared between job worker processes, hence the generous timeout
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys) -> Dict[str, Any]:
+        """
+        Cached values for `keys`, missing keys left out. Disk hits are read
+        with one SELECT per chunk and their access times bumped in a single
+        transaction.
+        """
+        found: Dict[str, Any] = {}
+
+        with self._lock:
+            missing = []
+            for key in dict.fromkeys(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                else:
+                    missing.append(key)
+
+            disk_hits = []
+            for start in range(0, len(missing), _SELECT_CHUNK):
+                chunk = missing[start:start + _SELECT_CHUNK]
+                rows = self._db.execute(
+                    f"SELECT key, value FROM results WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = json.loads(value)
+                    self._remember(key, found[key])
+                    disk_hits.append(key)
+
+            if disk_hits:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE results SET accessed = ? WHERE key = ?",
+                    [(now, key) for key in disk_hits]
+                )
+                self._db.commit()
+
+            self.hits += len(found)
+            self.misses += len(missing) - len(disk_hits)
+
+        return found
+
+    def set(self, key: str, value: Any):
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]):
+        if not items:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO results (key, value, accessed) VALUES (?, ?, ?)",
+                [(key, json.dumps(value), now) for key, value in items.items()]
+            )
+            self._db.commit()
+
+            for key, value in items.items():
+                self._remember(key, value)
+
+            self._writes += len(items)
+            if self._writes >= _EVICTION_CHECK_EVERY:
+                self._writes = 0
+                self._evict_disk()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM results")
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "memory_items": len(self._memory),
+        }
+
+    def _remember(self, key: str, value: Any):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        count = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = count - self._max_disk_items
+        if excess <= 0:
+            return
+
+        self._db.execute(
+            "DELETE FROM results WHERE key IN ("
+            "SELECT key FROM results ORDER BY accessed LIMIT ?)",
+            (excess,)
+        )
+        self._db.commit()
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
+
+
+def clear_result_cache():
+    """Drop every cached result, e.g. after the corpus is re-ingested."""
+    get_result_cache().clear()
@@ -0,0 +1,202 @@
+# app/services/jobs/job_queue.py
+import logging
+import multiprocessing
+from abc import ABC, abstractmethod
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Any, Dict, Optional
+
+from app.core.config import (
+    ANALYSIS_WORKERS,
+    ANALYSIS_MAX_QUEUE,
+    ANALYSIS_JOB_HISTORY,
+    JOB_QUEUE_BACKEND,
+    WARM_UP_MODELS,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobQueue(ABC):
+    """
+    Interface for analysis job backends. `LocalJobQueue` runs everything
+    in-process; an external broker can implement the same methods.
+    """
+
+    @abstractmethod
+    def submit(self, assignment_id: str) -> str:
+        ...
+
+    @abstractmethod
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def shutdown(self):
+        ...
+
+
+class LocalJobQueue(JobQueue):
+    """Bounded process pool; progress is shared through a Manager dict."""
+
+    def __init__(
+        self,
+        max_workers: int = ANALYSIS_WORKERS,
+        max_queue: int = ANALYSIS_MAX_QUEUE,
+        history: int = ANALYSIS_JOB_HISTORY
+    ):
+        # spawn: forking a process that already holds torch threads can deadlock
+        ctx = multiprocessing.get_context("spawn")
+        self._manager = ctx.Manager()
+        self._progress = self._manager.dict()
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=ctx,
+            initializer=_init_worker
+        )
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_queue = max_queue
+        self._history = history
+
+    def submit(self, assignment_id: str) -> str:
+        with self._lock:
+            active = sum(
+                1 for job in self._jobs.values()
+                if job["status"] in (QUEUED, RUNNING)
+            )
+            if active >= self._max_queue:
+                raise JobQueueFull(f"{active} analysis jobs already pending")
+
+            job_id = str(uuid.uuid4())
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "assignment_id": assignment_id,
+                "status": QUEUED,
+                "created_at": datetime.utcnow().isoformat(),
+                "finished_at": None,
+                "error": None,
+                "result": None,
+            }
+            self._progress[job_id] = {"stage": QUEUED, "progress": 0.0}
+
+        future = self._executor.submit(
+            _run_job, job_id, assignment_id, self._progress
+        )
+        future.add_done_callback(partial(self._finish, job_id))
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {k: v for k, v in job.items() if k != "result"}
+
+        if snapshot["status"] == QUEUED:
+            progress = self._progress.get(job_id) or {}
+            stage = progress.get("stage", QUEUED)
+            snapshot["stage"] = stage
+            snapshot["progress"] = progress.get("progress", 0.0)
+            if stage != QUEUED:
+                snapshot["status"] = RUNNING
+        else:
+            snapshot["stage"] = snapshot["status"]
+            snapshot["progress"] = 1.0
+
+        return snapshot
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job["result"] if job else None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
+
+    def _finish(self, job_id: str, future):
+        error = future.exception()
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+
+            if error is not None:
+                logger.error("Analysis job %s failed: %s", job_id, error)
+                job["status"] = FAILED
+                job["error"] = str(error)
+            else:
+                job["status"] = COMPLETED
+                job["result"] = future.result()
+
+            job["finished_at"] = datetime.utcnow().isoformat()
+            self._progress.pop(job_id, None)
+            self._evict_finished()
+
+    def _evict_finished(self):
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in (COMPLETED, FAILED)
+        ]
+        for job_id in finished[:max(0, len(finished) - self._history)]:
+            del self._jobs[job_id]
+
+
+# Worker process side
+
+def _init_worker():
+    if WARM_UP_MODELS:
+        from app.services.analysis.model_registry import warm_up_models
+        warm_up_models()
+
+
+def _run_job(job_id: str, assignment_id: str, progress_store) -> Dict[str, Any]:
+    from app.services.analysis.pipeline import analyze_assignment
+
+    def report_progress(stage: str, fraction: float):
+        progress_store[job_id] = {"stage": stage, "progress": round(fraction, 2)}
+
+    return analyze_assignment(assignment_id, progress=report_progress)
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+
+    with _queue_lock:
+        if _queue is None:
+            if JOB_QUEUE_BACKEND != "local":
+                raise ValueError(f"Unsupported JOB_QUEUE_BACKEND: {JOB_QUEUE_BACKEND}")
+            _queue = LocalJobQueue()
+        return _queue
+
+
+def shutdown_job_queue():
+    global _queue
+
+    with _queue_lock:
+        if _queue is not None:
+            _queue.shutdown()
+            _queue = None
@@ -0,0 +1,192 @@
+# app/services/plagiarism/cohort_index.py
+import hashlib
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import COHORT_TOP_K, EMBEDDING_MODEL_NAME, QUERY_BATCH_SIZE
+from app.db.chroma_collections import COLLECTION_NAMES, get_collection_handle
+from app.services.analysis.embedding_batcher import encode_sentences
+from app.services.analysis.text_similarity import SIMILARITY_THRESHOLD
+from app.services.preprocessing.normalize import normalize_and_hash
+
+PEER_MATCH = "peer_match"
+
+# Rows per upsert; Chroma rejects very large batches
+_UPSERT_BATCH = 1000
+
+
+def safe_course_id(course_id: str) -> str:
+    """[a-zA-Z0-9_-], at most 40 characters; long or odd ids get a hash suffix."""
+    safe = re.sub(r"[^a-zA-Z0-9_-]+", "_", course_id).strip("_-")
+    if not safe or len(safe) > 40:
+        safe = (safe[:27] + "_" if safe else "") + hashlib.sha256(course_id.encode("utf-8")).hexdigest()[:12]
+    return safe
+
+
+def cohort_collection_name(course_id: str) -> str:
+    """student_text__<course>, within Chroma's 63-character name limit."""
+    return f"{COLLECTION_NAMES['student_text']}__{safe_course_id(course_id)}"
+
+
+class CohortIndex:
+    """
+    Sentences of every analysed submission in one course: MiniLM embedding
+    plus normalised-sentence hash per row, one Chroma collection per
+    course so each HNSW index only grows with its own cohort.
+
+    Rows are keyed by assignment id; a student's earlier versions are
+    excluded from their own checks through the `student_id` metadata.
+    """
+
+    def __init__(self, course_id: str):
+        self.course_id = course_id
+        self.collection = get_collection_handle(cohort_collection_name(course_id))
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def check(
+        self,
+        sentences: List[str],
+        embeddings: Optional[np.ndarray] = None,
+        assignment_id: Optional[str] = None,
+        student_id: Optional[str] = None,
+        start_id: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        peer_match flags for `sentences` against everyone else in the
+        cohort: one bulk hash lookup for verbatim copies, then one batched
+        nearest-neighbour query for the rest.
+        """
+        size = self.count()
+        if not sentences or size == 0:
+            return []
+
+        exclude = _exclude_own(assignment_id, student_id)
+        if embeddings is None:
+            embeddings = encode_sentences(EMBEDDING_MODEL_NAME, sentences)
+
+        hashes = [normalize_and_hash(s)[1] for s in sentences]
+        flags = self._exact_flags(sentences, hashes, exclude)
+        resolved = {flag["sentence_id"] for flag in flags}
+
+        remaining = [i for i, h in enumerate(hashes) if h and i not in resolved]
+        for start in range(0, len(remaining), QUERY_BATCH_SIZE):
+            rows = remaining[start:start + QUERY_BATCH_SIZE]
+            query = {
+                "query_embeddings": np.asarray(embeddings)[rows].tolist(),
+                "n_results": min(COHORT_TOP_K, size),
+                "include": ["documents", "metadatas", "distances"],
+            }
+            if exclude:
+                query["where"] = exclude
+            result = self.collection.query(**query)
+
+            for i, documents, metadatas, distances in zip(
+                rows, result["documents"], result["metadatas"], result["distances"]
+            ):
+                flag = _semantic_flag(sentences[i], i, documents, metadatas, distances)
+                if flag is not None:
+                    flags.append(flag)
+
+        for flag in flags:
+            flag["sentence_id"] += start_id
+        return sorted(flags, key=lambda flag: flag["sentence_id"])
+
+    def insert(
+        self,
+        assignment_id: str,
+        sentences: List[str],
+        embeddings: Optional[np.ndarray] = None,
+        student_id: Optional[str] = None
+    ) -> int:
+        """Add (or replace) one submission's sentences. Returns rows written."""
+        rows = []
+        for i, sentence in enumerate(sentences):
+            _, h = normalize_and_hash(sentence)
+            if h:
+                rows.append((i, sentence, h))
+
+        # A re-analysed submission replaces its previous rows
+        self.collection.delete(where={"assignment_id": assignment_id})
+        if not rows:
+            return 0
+
+        if embeddings is None:
+            embeddings = encode_sentences(EMBEDDING_MODEL_NAME, sentences)
+        embeddings = np.asarray(embeddings)
+
+        # student_id is always set: Chroma's $ne skips rows missing the key
+        metadata = {
+            "type": "student",
+            "assignment_id": assignment_id,
+            "course_id": self.course_id,
+            "student_id": student_id or "",
+        }
+
+        for start in range(0, len(rows), _UPSERT_BATCH):
+            batch = rows[start:start + _UPSERT_BATCH]
+            self.collection.upsert(
+                ids=[f"{assignment_id}_{i}" for i, _, _ in batch],
+                documents=[s for _, s, _ in batch],
+                embeddings=embeddings[[i for i, _, _ in batch]].tolist(),
+                metadatas=[dict(metadata, hash=h, sentence_id=i) for i, _, h in batch]
+            )
+
+        return len(rows)
+
+    def _exact_flags(self, sentences, hashes, exclude) -> List[Dict[str, Any]]:
+        distinct = list({h for h in hashes if h})
+        if not distinct:
+            return []
+
+        where = {"hash": {"$in": distinct}}
+        if exclude:
+            where = {"$and": [where, exclude]}
+        result = self.collection.get(where=where, include=["documents", "metadatas"])
+
+        found: Dict[str, tuple] = {}
+        for document, meta in zip(result.get("documents") or [], result.get("metadatas") or []):
+            found.setdefault(meta["hash"], (document, meta))
+
+        flags = []
+        for i, (sentence, h) in enumerate(zip(sentences, hashes)):
+            if h not in found:
+                continue
+            document, meta = found[h]
+            flags.append(_flag(sentence, i, "exact", 1.0, document, meta))
+        return flags
+
+
+def _exclude_own(assignment_id: Optional[str], student_id: Optional[str]) -> Optional[Dict]:
+    if student_id:
+        return {"student_id": {"$ne": student_id}}
+    if assignment_id:
+        return {"assignment_id": {"$ne": assignment_id}}
+    return None
+
+
+def _semantic_flag(sentence, i, documents, metadatas, distances) -> Optional[Dict[str, Any]]:
+    if not distances:
+        return None
+
+    similarity = 1 - distances[0]
+    if similarity < SIMILARITY_THRESHOLD:
+        return None
+    return _flag(sentence, i, "semantic", round(similarity, 3), documents[0], metadatas[0])
+
+
+def _flag(sentence, i, match, confidence, document, meta) -> Dict[str, Any]:
+    return {
+        "sentence_id": i,
+        "sentence": sentence,
+        "type": PEER_MATCH,
+        "match": match,
+        "confidence": confidence,
+        "source": f"submission:{meta.get('assignment_id', 'Unknown')}",
+        "matched_text": document,
+        "matched_assignment_id": meta.get("assignment_id"),
+        "matched_student_id": meta.get("student_id") or None,
+    }
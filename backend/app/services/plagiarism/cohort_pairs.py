@@ -0,0 +1,333 @@
+# app/services/plagiarism/cohort_pairs.py
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+from app.core.config import (
+    EMBEDDING_MODEL_NAME,
+    COHORT_BLOCK_SIZE,
+    COHORT_WORKERS,
+    COHORT_BOILERPLATE_FRACTION,
+)
+from app.services.analysis.embedding_batcher import encode_sentences
+from app.services.analysis.pipeline import UPLOADS_DIR, extracted_text_path, load_sentences
+from app.services.analysis.text_similarity import SIMILARITY_THRESHOLD
+from app.services.preprocessing.normalize import normalize_and_hash
+from app.services.storage.file_store import FileStore
+
+# A sentence used by fewer students than this is never treated as template text
+_MIN_BOILERPLATE_STUDENTS = 5
+
+
+@dataclass
+class CohortSubmission:
+    assignment_id: str
+    student_id: Optional[str]
+    sentences: List[str]
+
+
+@dataclass
+class CohortPairs:
+    """Sparse sentence pairs (row_a < row_b) over the stacked cohort sentences."""
+    submissions: List[CohortSubmission]
+    offsets: np.ndarray        # submission i owns rows offsets[i]:offsets[i + 1]
+    row_a: np.ndarray
+    row_b: np.ndarray
+    similarity: np.ndarray
+    exact: np.ndarray          # shared normalised-sentence hash
+    boilerplate_rows: int
+    seconds: Dict[str, float]
+
+
+def load_cohort_submissions(course_id: str) -> List[CohortSubmission]:
+    """
+    The latest upload per student with this course_id and extracted text,
+    oldest first. Uploads without a student_id are each kept.
+    """
+    store = FileStore()
+    uploads = []
+
+    for assignment_id in os.listdir(UPLOADS_DIR):
+        submission = store.read_submission(assignment_id)
+        if not submission or submission.get("course_id") != course_id:
+            continue
+        if not extracted_text_path(assignment_id).exists():
+            continue
+
+        uploads.append((
+            extracted_text_path(assignment_id).stat().st_mtime,
+            assignment_id,
+            submission.get("student_id")
+        ))
+
+    # Re-uploads replace the student's earlier versions
+    latest = {}
+    for mtime, assignment_id, student_id in sorted(uploads):
+        latest[student_id or f"assignment:{assignment_id}"] = (mtime, assignment_id, student_id)
+
+    return [
+        CohortSubmission(assignment_id, student_id, load_sentences(assignment_id))
+        for _, assignment_id, student_id in sorted(latest.values())
+    ]
+
+
+def compute_cohort_pairs(
+    submissions: List[CohortSubmission],
+    work_dir: str,
+    model_name: str = EMBEDDING_MODEL_NAME,
+    threshold: float = SIMILARITY_THRESHOLD,
+    block_size: int = COHORT_BLOCK_SIZE,
+    workers: int = COHORT_WORKERS,
+    boilerplate_fraction: float = COHORT_BOILERPLATE_FRACTION
+) -> CohortPairs:
+    """
+    All sentence pairs from different students with cosine similarity >=
+    `threshold`, plus every pair sharing a normalised-sentence hash.
+
+    Embeddings are stacked into a memory-mapped matrix under `work_dir`
+    and scored block against block on `workers` threads, so memory is
+    bounded by workers * block_size^2 floats plus the pairs kept.
+    Sentences shared by more than `boilerplate_fraction` of the cohort's
+    students (prompt text, headings) are left out of both joins.
+    """
+    seconds = {}
+    started = time.perf_counter()
+
+    counts = np.array([len(s.sentences) for s in submissions], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    owner = np.repeat(np.arange(len(submissions)), counts)
+    student = _student_codes(submissions)[owner]
+
+    hashes = [normalize_and_hash(sentence)[1] for s in submissions for sentence in s.sentences]
+    boilerplate = _boilerplate_hashes(hashes, student, boilerplate_fraction)
+    skip = np.array([not h or h in boilerplate for h in hashes], dtype=bool)
+
+    # Hash join: verbatim (normalised) copies
+    exact_a, exact_b = _shared_hash_pairs(hashes, skip, student)
+    seconds["hash_join"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    embeddings = _stack_embeddings(submissions, offsets, skip, model_name, work_dir)
+    seconds["embed"] = time.perf_counter() - started
+
+    # Blocked matmul over the upper triangle of the similarity matrix
+    started = time.perf_counter()
+    n = len(owner)
+    starts = range(0, n, block_size)
+    tasks = [(i, j) for i in starts for j in starts if j >= i]
+
+    # One BLAS thread per block worker while scoring: the blocks are the
+    # parallelism. The encode stage above keeps every core.
+    with threadpool_limits(limits=1, user_api="blas"), ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        # numpy releases the GIL inside matmul and comparisons
+        results = list(pool.map(
+            lambda task: _score_block(embeddings, student, task[0], task[1], block_size, threshold),
+            tasks
+        ))
+    seconds["matmul"] = time.perf_counter() - started
+
+    row_a = np.concatenate([exact_a] + [r[0] for r in results])
+    row_b = np.concatenate([exact_b] + [r[1] for r in results])
+    similarity = np.concatenate([np.ones(len(exact_a), dtype=np.float32)] + [r[2] for r in results])
+    exact = np.zeros(len(row_a), dtype=bool)
+    exact[:len(exact_a)] = True
+
+    # A verbatim pair also comes out of the matmul: keep one, exact wins
+    keys = row_a * n + row_b
+    order = np.lexsort((-similarity, ~exact, keys))
+    keys, row_a, row_b, similarity, exact = keys[order], row_a[order], row_b[order], similarity[order], exact[order]
+    first = np.concatenate([[True], keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=bool)
+
+    return CohortPairs(
+        submissions=submissions,
+        offsets=offsets,
+        row_a=row_a[first],
+        row_b=row_b[first],
+        similarity=similarity[first],
+        exact=exact[first],
+        boilerplate_rows=int(sum(1 for h in hashes if h and h in boilerplate)),
+        seconds=seconds,
+    )
+
+
+def summarize_pairs(pairs: CohortPairs) -> List[Dict]:
+    """One row per submission pair with matches, most overlapping first."""
+    owner = np.repeat(np.arange(len(pairs.submissions)), np.diff(pairs.offsets))
+    totals = np.diff(pairs.offsets)
+
+    groups = defaultdict(lambda: {"rows_a": set(), "rows_b": set(), "exact": 0, "max": 0.0})
+    for a, b, similarity, exact in zip(pairs.row_a, pairs.row_b, pairs.similarity, pairs.exact):
+        oa, ob = int(owner[a]), int(owner[b])
+        if oa > ob:
+            oa, ob, a, b = ob, oa, b, a
+        group = groups[(oa, ob)]
+        group["rows_a"].add(int(a))
+        group["rows_b"].add(int(b))
+        group["exact"] += int(exact)
+        group["max"] = max(group["max"], float(similarity))
+
+    summary = []
+    for (oa, ob), group in groups.items():
+        a, b = pairs.submissions[oa], pairs.submissions[ob]
+        summary.append({
+            "assignment_a": a.assignment_id,
+            "student_a": a.student_id,
+            "assignment_b": b.assignment_id,
+            "student_b": b.student_id,
+            "matched_a": len(group["rows_a"]),
+            "matched_b": len(group["rows_b"]),
+            "coverage_a": round(len(group["rows_a"]) / max(1, int(totals[oa])), 4),
+            "coverage_b": round(len(group["rows_b"]) / max(1, int(totals[ob])), 4),
+            "exact_sentences": group["exact"],
+            "max_similarity": round(group["max"], 4),
+        })
+
+    summary.sort(key=lambda row: max(row["coverage_a"], row["coverage_b"]), reverse=True)
+    return summary
+
+
+def write_cohort_report(course_id: str, pairs: CohortPairs, output_dir: str, **manifest) -> List[Dict]:
+    """
+    pairs.csv: submission pairs; sentence_pairs.npz: the sparse sentence
+    pairs (global rows, see submissions.json offsets).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    summary = summarize_pairs(pairs)
+
+    np.savez_compressed(
+        os.path.join(output_dir, "sentence_pairs.npz"),
+        row_a=pairs.row_a,
+        row_b=pairs.row_b,
+        similarity=pairs.similarity.astype(np.float32),
+        exact=pairs.exact,
+    )
+
+    with open(os.path.join(output_dir, "submissions.json"), "w", encoding="utf-8") as f:
+        json.dump([
+            {
+                "assignment_id": s.assignment_id,
+                "student_id": s.student_id,
+                "offset": int(pairs.offsets[i]),
+                "sentences": len(s.sentences),
+            }
+            for i, s in enumerate(pairs.submissions)
+        ], f, indent=2)
+
+    with open(os.path.join(output_dir, "pairs.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=[
+            "assignment_a", "student_a", "assignment_b", "student_b",
+            "matched_a", "matched_b", "coverage_a", "coverage_b",
+            "exact_sentences", "max_similarity",
+        ])
+        writer.writeheader()
+        writer.writerows(summary)
+
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(dict(
+            manifest,
+            course_id=course_id,
+            created_at=datetime.utcnow().isoformat(),
+            submissions=len(pairs.submissions),
+            sentences=int(pairs.offsets[-1]),
+            boilerplate_sentences=pairs.boilerplate_rows,
+            sentence_pairs=int(len(pairs.row_a)),
+            submission_pairs=len(summary),
+            seconds={stage: round(value, 2) for stage, value in pairs.seconds.items()},
+        ), f, indent=2)
+
+    return summary
+
+
+# Stages
+
+def _student_codes(submissions: List[CohortSubmission]) -> np.ndarray:
+    """Same code for the same student; submissions without one get their own."""
+    codes: Dict[str, int] = {}
+    result = np.empty(len(submissions), dtype=np.int64)
+    for i, submission in enumerate(submissions):
+        key = f"student:{submission.student_id}" if submission.student_id else f"assignment:{i}"
+        result[i] = codes.setdefault(key, len(codes))
+    return result
+
+
+def _boilerplate_hashes(hashes, student, fraction: float) -> set:
+    """Hashes shared by more than `fraction` of the cohort's students."""
+    limit = max(_MIN_BOILERPLATE_STUDENTS, int(fraction * len(np.unique(student))))
+    students = defaultdict(set)
+    for h, code in zip(hashes, student):
+        if h:
+            students[h].add(int(code))
+    return {h for h, found in students.items() if len(found) > limit}
+
+
+def _shared_hash_pairs(hashes, skip, student):
+    rows_by_hash = defaultdict(list)
+    for row, h in enumerate(hashes):
+        if not skip[row]:
+            rows_by_hash[h].append(row)
+
+    row_a, row_b = [], []
+    for rows in rows_by_hash.values():
+        if len(rows) < 2:
+            continue
+        # Groups are small: template sentences were dropped as boilerplate
+        for x, a in enumerate(rows):
+            for b in rows[x + 1:]:
+                if student[a] != student[b]:
+                    row_a.append(a)
+                    row_b.append(b)
+
+    return np.array(row_a, dtype=np.int64), np.array(row_b, dtype=np.int64)
+
+
+def _stack_embeddings(submissions, offsets, skip, model_name: str, work_dir: str) -> np.ndarray:
+    """Normalised embeddings of every sentence in one .npy memmap; skipped rows are zero."""
+    os.makedirs(work_dir, exist_ok=True)
+    embeddings = None
+
+    for i, submission in enumerate(submissions):
+        if not submission.sentences:
+            continue
+        # Goes through the embedding cache: analysed submissions are not re-encoded
+        vectors = encode_sentences(model_name, submission.sentences)
+        if embeddings is None:
+            embeddings = np.lib.format.open_memmap(
+                os.path.join(work_dir, "embeddings.npy"),
+                mode="w+",
+                dtype=np.float32,
+                shape=(int(offsets[-1]), vectors.shape[1])
+            )
+        start, end = offsets[i], offsets[i + 1]
+        embeddings[start:end] = vectors
+        embeddings[start:end][skip[start:end]] = 0.0
+
+    if embeddings is None:
+        return np.zeros((0, 1), dtype=np.float32)
+    embeddings.flush()
+    return embeddings
+
+
+def _score_block(embeddings, student, i: int, j: int, block_size: int, threshold: float):
+    a = np.asarray(embeddings[i:i + block_size])
+    b = a if i == j else np.asarray(embeddings[j:j + block_size])
+
+    scores = a @ b.T
+    rows, cols = np.nonzero(scores >= threshold)
+    if i == j:
+        upper = rows < cols
+        rows, cols = rows[upper], cols[upper]
+
+    rows, cols = rows + i, cols + j
+    other = student[rows] != student[cols]
+    rows, cols = rows[other], cols[other]
+
+    return rows.astype(np.int64), cols.astype(np.int64), scores[rows - i, cols - j].astype(np.float32)
@@ -1,7 +1,8 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import chromadb
 from chromadb.config import Settings
 
+from app.db.chroma_collections import get_collection_handle
 from app.services.preprocessing.normalize import normalize_and_hash
 
 # Chroma Initialization
@@ -15,9 +16,17 @@ def get_chroma_client(persist_dir: str):
     )
 
 
-def get_exact_match_collection(client):
+EXACT_MATCH_COLLECTION_NAME = "exact_sentence_index"
+
+
+def get_exact_match_collection(client=None):
+    """Pooled handle by default; pass a client to bypass the pool."""
+    if client is None:
+        return get_collection_handle(
+            EXACT_MATCH_COLLECTION_NAME, metadata={"type": "exact_match"}
+        )
     return client.get_or_create_collection(
-        name="exact_sentence_index",
+        name=EXACT_MATCH_COLLECTION_NAME,
         metadata={"type": "exact_match"}
     )
 
@@ -26,21 +35,40 @@ def get_exact_match_collection(client):
 def ingest_corpus_sentences(
     collection,
     sentences: List[str],
-    document_id: str
+    document_id: str,
+    embeddings: Optional[List[List[float]]] = None
 ):
-    ids, documents, metadatas = [], [], []
-
-    for s in sentences:
+    """
+    Upsert one row per distinct normalised sentence and file, keyed by
+    hash:document_id, so removing one file never drops another file's rows.
+    Pass the sentence embeddings when available so Chroma does not run
+    its own embedding function over the documents.
+    """
+    rows = {}
+
+    for i, s in enumerate(sentences):
         normalized, h = normalize_and_hash(s)
-        if not normalized:
+        if not normalized or h in rows:
             continue
+        rows[h] = (normalized, embeddings[i] if embeddings is not None else None)
+
+    if not rows:
+        return
 
-        ids.append(h)
-        documents.append(normalized)
-        metadatas.append({"document_id": document_id})
+    hashes = list(rows)
+    ids = [f"{h}:{document_id}" for h in hashes]
+    documents = [rows[h][0] for h in hashes]
+    metadatas = [{"document_id": document_id, "hash": h} for h in hashes]
 
-    if ids:
-        collection.add(
+    if embeddings is not None:
+        collection.upsert(
+            ids=ids,
+            documents=documents,
+            embeddings=[rows[h][1] for h in hashes],
+            metadatas=metadatas
+        )
+    else:
+        collection.upsert(
             ids=ids,
             documents=documents,
             metadatas=metadatas
@@ -53,23 +81,46 @@ def check_exact_match(
     collection,
     sentences: List[str]
 ) -> List[Dict[str, Any]]:
-    matches = []
+    """
+    Exact (normalised) matches for a whole document with a single
+    bulk lookup. `sentence_id` is the index into `sentences`.
+    """
+    hashed = []
 
-    for s in sentences:
+    for i, s in enumerate(sentences):
         normalized, h = normalize_and_hash(s)
-        if not normalized:
+        if normalized:
+            hashed.append((i, s, normalized, h))
+
+    if not hashed:
+        return []
+
+    result = collection.get(
+        where={"hash": {"$in": list({h for _, _, _, h in hashed})}},
+        include=["metadatas"]
+    )
+
+    # Every file containing the sentence, first one reported as the source
+    sources: Dict[str, List[Dict]] = {}
+    for meta in result.get("metadatas") or []:
+        sources.setdefault(meta["hash"], []).append(meta)
+
+    matches = []
+
+    for i, s, normalized, h in hashed:
+        if h not in sources:
             continue
 
-        result = collection.get(ids=[h])
-
-        if result and result.get("ids"):
-            matches.append({
-                "sentence": s,
-                "normalized": normalized,
-                "hash": h,
-                "confidence": 1.0,
-                "type": "exact_match",
-                "sources": result["metadatas"]
-            })
+        metas = sources[h]
+        matches.append({
+            "sentence_id": i,
+            "sentence": s,
+            "normalized": normalized,
+            "hash": h,
+            "confidence": 1.0,
+            "type": "exact_match",
+            "source": metas[0].get("document_id", "Unknown"),
+            "sources": metas
+        })
 
     return matches
@@ -0,0 +1,366 @@
+import json
+import os
+import shutil
+import threading
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import NEAR_DUPLICATE_INDEX_PATH, NEAR_DUPLICATE_THRESHOLD
+from app.db.corpus_shards import iter_collection_pages
+from app.services.analysis.corpus_text_store import (
+    CorpusTextStore,
+    CorpusTextWriter,
+    has_corpus_text_store,
+)
+from app.services.preprocessing.normalize import normalize_sentence
+
+SHINGLE_SIZE = 3
+NUM_PERM = 128
+BANDS = 32
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+# (a * x + b) mod p with x < 2^32 and a, b < p stays inside uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+# Odd multipliers folding a band's rows into one 64-bit bucket key
+_BAND_MIX = (_rng.randint(1, 1 << 62, size=ROWS_PER_BAND).astype(np.uint64) * 2 + 1)
+
+_MANIFEST_FILE = "manifest.json"
+_SIGNATURES_FILE = "signatures.npy"
+_BAND_KEYS_FILE = "band_keys.npy"
+_BAND_ORDER_FILE = "band_order.npy"
+_RECORDS_FILE = "records.json"
+_CURRENT_FILE = "CURRENT"
+
+# Versions kept on disk: the current one and the one readers may still have open
+_KEEP_VERSIONS = 2
+
+# Signature rows banded at once while building
+_KEY_CHUNK_ROWS = 65536
+
+
+# MinHash
+
+def shingles(sentence: str) -> List[str]:
+    words = normalize_sentence(sentence).split()
+    if not words:
+        return []
+    if len(words) <= SHINGLE_SIZE:
+        return [" ".join(words)]
+    return [
+        " ".join(words[i:i + SHINGLE_SIZE])
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    ]
+
+
+def minhash_signature(sentence: str) -> Optional[np.ndarray]:
+    tokens = shingles(sentence)
+    if not tokens:
+        return None
+
+    hashes = np.fromiter(
+        (zlib.crc32(t.encode("utf-8")) for t in set(tokens)),
+        dtype=np.uint64
+    )
+    permuted = (hashes[:, None] * _PERM_A + _PERM_B) % _PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """(n, NUM_PERM) signatures -> (n, BANDS) uint64 bucket keys."""
+    bands = signatures.astype(np.uint64).reshape(len(signatures), BANDS, ROWS_PER_BAND)
+    return (bands * _BAND_MIX).sum(axis=2, dtype=np.uint64)
+
+
+# Index
+
+class NearDuplicateIndex:
+    """
+    LSH over MinHash signatures. Buckets are stored as one sorted key
+    array per band, so a lookup is BANDS binary searches.
+    """
+
+    def __init__(
+        self,
+        manifest: Dict,
+        signatures: np.ndarray,
+        sorted_keys: np.ndarray,
+        order: np.ndarray,
+        documents: List[str],
+        sources: List[str]
+    ):
+        self.manifest = manifest
+        self.signatures = signatures
+        self.sorted_keys = sorted_keys
+        self.order = order
+        self.documents = documents
+        self.sources = sources
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def query(self, sentence: str, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        """Best corpus row and its estimated Jaccard similarity, or None."""
+        signature = minhash_signature(sentence)
+        if signature is None or len(self) == 0:
+            return None
+
+        keys = band_keys(signature[None, :])[0]
+        candidates = []
+
+        for band in range(BANDS):
+            row = self.sorted_keys[band]
+            lo = np.searchsorted(row, keys[band], side="left")
+            hi = np.searchsorted(row, keys[band], side="right")
+            if hi > lo:
+                candidates.append(self.order[band][lo:hi])
+
+        if not candidates:
+            return None
+
+        candidates = np.unique(np.concatenate(candidates))
+        jaccard = (self.signatures[candidates] == signature).mean(axis=1)
+
+        best = int(np.argmax(jaccard))
+        if jaccard[best] < threshold:
+            return None
+        return int(candidates[best]), float(jaccard[best])
+
+    def check(self, sentences: List[str]) -> List[Dict[str, Any]]:
+        """Near-duplicate flags; `sentence_id` is the index into `sentences`."""
+        matches = []
+
+        for i, s in enumerate(sentences):
+            hit = self.query(s)
+            if hit is None:
+                continue
+
+            row, jaccard = hit
+            matches.append({
+                "sentence_id": i,
+                "sentence": s,
+                "type": "near_duplicate",
+                "confidence": round(jaccard, 3),
+                "source": self.sources[row],
+                "matched_sentence": self.documents[row]
+            })
+
+        return matches
+
+
+# Build (ingest time)
+
+def build_near_duplicate_index(
+    documents: List[str],
+    sources: List[str],
+    path: str = NEAR_DUPLICATE_INDEX_PATH,
+    ids: Optional[List[str]] = None
+) -> str:
+    writer = NearDuplicateIndexWriter(path)
+    writer.append(ids or [str(i) for i in range(len(documents))], documents, sources)
+    return writer.publish()
+
+
+class NearDuplicateIndexWriter:
+    """
+    Builds a new index version page by page. Signatures are streamed to
+    disk as they are computed; publish() bands them and sorts one band at
+    a time, then points readers at the new version.
+    """
+
+    def __init__(self, path: str = NEAR_DUPLICATE_INDEX_PATH):
+        self.path = path
+        self.version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        self.version_dir = os.path.join(path, self.version)
+        os.makedirs(self.version_dir)
+        self.rows = 0
+
+        self._texts = CorpusTextWriter(self.version_dir)
+        self._raw_path = os.path.join(self.version_dir, _SIGNATURES_FILE + ".raw")
+        self._raw = open(self._raw_path, "wb")
+
+    def append(self, ids: List[str], documents: List[str], sources: List[str]):
+        keep = []
+        signatures = []
+
+        for i, doc in enumerate(documents):
+            signature = minhash_signature(doc)
+            if signature is not None:
+                keep.append(i)
+                signatures.append(signature)
+
+        if not keep:
+            return
+
+        self._raw.write(np.vstack(signatures).astype(np.uint32).tobytes())
+        self._texts.append(
+            [ids[i] for i in keep],
+            [documents[i] for i in keep],
+            [sources[i] for i in keep]
+        )
+        self.rows += len(keep)
+
+    def publish(self) -> str:
+        self._raw.close()
+        self._texts.close()
+
+        signatures_path = os.path.join(self.version_dir, _SIGNATURES_FILE)
+        _raw_to_npy(self._raw_path, signatures_path, np.uint32, (self.rows, NUM_PERM))
+        signatures = np.load(signatures_path, mmap_mode="r")
+
+        sorted_keys = np.lib.format.open_memmap(
+            os.path.join(self.version_dir, _BAND_KEYS_FILE), mode="w+",
+            dtype=np.uint64, shape=(BANDS, self.rows)
+        )
+        order = np.lib.format.open_memmap(
+            os.path.join(self.version_dir, _BAND_ORDER_FILE), mode="w+",
+            dtype=np.int64, shape=(BANDS, self.rows)
+        )
+
+        for start in range(0, self.rows, _KEY_CHUNK_ROWS):
+            sorted_keys[:, start:start + _KEY_CHUNK_ROWS] = band_keys(
+                np.asarray(signatures[start:start + _KEY_CHUNK_ROWS])
+            ).T
+
+        for band in range(BANDS):
+            keys = np.array(sorted_keys[band])
+            band_order = np.argsort(keys, kind="stable")
+            sorted_keys[band] = keys[band_order]
+            order[band] = band_order
+
+        sorted_keys.flush()
+        order.flush()
+        del sorted_keys, order, signatures
+
+        with open(os.path.join(self.version_dir, _MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "version": self.version,
+                "count": self.rows,
+                "shingle_size": SHINGLE_SIZE,
+                "num_perm": NUM_PERM,
+                "bands": BANDS,
+                "created_at": datetime.utcnow().isoformat()
+            }, f, indent=2)
+
+        # Atomically point readers at the new version
+        tmp_path = os.path.join(self.path, _CURRENT_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.version)
+        os.replace(tmp_path, os.path.join(self.path, _CURRENT_FILE))
+
+        _prune_old_versions(self.path)
+        return self.version
+
+
+def _raw_to_npy(raw_path: str, npy_path: str, dtype, shape):
+    """Wrap a raw C-order dump in an .npy header without loading it."""
+    with open(npy_path, "wb") as out, open(raw_path, "rb") as raw:
+        np.lib.format.write_array_header_1_0(out, {
+            "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            "fortran_order": False,
+            "shape": shape,
+        })
+        shutil.copyfileobj(raw, out)
+    os.remove(raw_path)
+
+
+def _prune_old_versions(path: str):
+    versions = sorted(
+        d for d in os.listdir(path)
+        if os.path.isdir(os.path.join(path, d))
+    )
+    for old in versions[:-_KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+
+
+def build_near_duplicate_index_from_collection(collection) -> str:
+    writer = NearDuplicateIndexWriter()
+    for page in iter_collection_pages(collection, include=["documents", "metadatas"]):
+        writer.append(
+            page["ids"],
+            page["documents"],
+            [(meta or {}).get("source", "Unknown") for meta in page["metadatas"]]
+        )
+    return writer.publish()
+
+
+# Load
+
+def current_index_dir(path: str = NEAR_DUPLICATE_INDEX_PATH) -> Optional[str]:
+    """Directory of the current index version, or None if none was built."""
+    current_path = os.path.join(path, _CURRENT_FILE)
+    if os.path.exists(current_path):
+        with open(current_path, encoding="utf-8") as f:
+            version = f.read().strip()
+        if version:
+            return os.path.join(path, version)
+
+    # Built before versioned directories: files directly under `path`
+    if os.path.exists(os.path.join(path, _MANIFEST_FILE)):
+        return path
+    return None
+
+
+def load_near_duplicate_index(path: str = NEAR_DUPLICATE_INDEX_PATH) -> Optional[NearDuplicateIndex]:
+    index_dir = current_index_dir(path)
+    if index_dir is None:
+        return None
+    path = index_dir
+
+    with open(os.path.join(path, _MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if (
+        manifest.get("num_perm") != NUM_PERM
+        or manifest.get("bands") != BANDS
+        or manifest.get("shingle_size") != SHINGLE_SIZE
+    ):
+        print(f"⚠️ Near-duplicate index at {path} was built with other parameters, ignoring")
+        return None
+
+    if has_corpus_text_store(path):
+        texts = CorpusTextStore(path)
+        records = {"documents": texts.documents, "sources": texts.sources}
+    else:
+        # Built before the text store existed
+        with open(os.path.join(path, _RECORDS_FILE), encoding="utf-8") as f:
+            records = json.load(f)
+
+    return NearDuplicateIndex(
+        manifest=manifest,
+        signatures=np.load(os.path.join(path, _SIGNATURES_FILE), mmap_mode="r"),
+        sorted_keys=np.load(os.path.join(path, _BAND_KEYS_FILE), mmap_mode="r"),
+        order=np.load(os.path.join(path, _BAND_ORDER_FILE), mmap_mode="r"),
+        documents=records["documents"],
+        sources=records["sources"]
+    )
+
+
+_index: Optional[NearDuplicateIndex] = None
+_index_dir: Optional[str] = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """Process-wide cached index; reloaded after ingest rebuilds it."""
+    global _index, _index_dir
+
+    index_dir = current_index_dir()
+    if index_dir is None:
+        return None
+
+    with _index_lock:
+        if _index is None or _index_dir != index_dir:
+            _index = load_near_duplicate_index()
+            _index_dir = index_dir
+        return _index
@@ -26,9 +26,11 @@ def calculate_score(
 
 WEIGHTS = {
     "exact_match": 1.0,
+    "near_duplicate": 0.9,
     "semantic": 1.0,       
     "paraphrase": 0.7,
-    "ai_generated": 0.8
+    "ai_generated": 0.8,
+    "peer_match": 1.0
 }
 
 
@@ -1,11 +1,17 @@
+import json
 import os
 import uuid
 from fastapi import UploadFile
-from shutil import copyfileobj
+from typing import Optional
+
+from app.core.config import UPLOAD_CHUNK_SIZE
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
 UPLOADS_DIR = os.path.join(BASE_DIR, "data", "uploads")
 
+_STATUS_FILE = "status.json"
+_SUBMISSION_FILE = "submission.json"
+
 
 class FileStore:
     def __init__(self) -> None:
@@ -16,14 +22,50 @@ class FileStore:
         folder = os.path.join(UPLOADS_DIR, assignment_id)
         os.makedirs(folder, exist_ok=True)
 
-        raw_path = os.path.join(folder, file.filename)
+        raw_path = self.get_upload_path(assignment_id, file.filename)
 
+        # Chunked, so a large upload never sits in memory at once
         with open(raw_path, "wb") as buffer:
             await file.seek(0)
-            copyfileobj(file.file, buffer)
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                buffer.write(chunk)
 
         print(f"📁 Saved file at: {raw_path}")
         return assignment_id
 
     def get_assignment_dir(self, assignment_id: str) -> str:
         return os.path.join(UPLOADS_DIR, assignment_id)
+
+    def get_upload_path(self, assignment_id: str, filename: str) -> str:
+        # basename: the client controls the filename
+        return os.path.join(
+            self.get_assignment_dir(assignment_id),
+            os.path.basename(filename or "upload")
+        )
+
+    def write_status(self, assignment_id: str, status: dict):
+        self._write_json(assignment_id, _STATUS_FILE, status)
+
+    def read_status(self, assignment_id: str) -> Optional[dict]:
+        return self._read_json(assignment_id, _STATUS_FILE)
+
+    def write_submission(self, assignment_id: str, submission: dict):
+        """Who submitted it: course_id / student_id, for the cohort check."""
+        self._write_json(assignment_id, _SUBMISSION_FILE, submission)
+
+    def read_submission(self, assignment_id: str) -> Optional[dict]:
+        return self._read_json(assignment_id, _SUBMISSION_FILE)
+
+    def _write_json(self, assignment_id: str, name: str, data: dict):
+        path = os.path.join(self.get_assignment_dir(assignment_id), name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, assignment_id: str, name: str) -> Optional[dict]:
+        path = os.path.join(self.get_assignment_dir(assignment_id), name)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
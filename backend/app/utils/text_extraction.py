@@ -1,9 +1,40 @@
 from fastapi import HTTPException
-from io import BytesIO
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Sequence
 import pdfplumber
 from pathlib import Path
 
+from app.core.config import EXTRACTION_WORKERS, OCR_WINDOW_PAGES, OCR_DPI
+
+logger = logging.getLogger(__name__)
+
+# Pages with less digital text than this are sent to OCR
+MIN_PAGE_TEXT_LENGTH = 20
+# Documents with less digital text than this need OCR to succeed
 MIN_TEXT_LENGTH = 50
+# Documents this short are extracted in-process
+_INLINE_MAX_PAGES = 2
+# Upper bound on pages per digital-extraction task
+_MAX_PAGES_PER_TASK = 16
+
+
+class OCRError(Exception):
+    pass
+
+
+@dataclass
+class PageText:
+    page: int       # 0-based
+    text: str
+    method: str     # "text" | "ocr"
+    seconds: float
 
 
 def extract_text_from_bytes(filename: str, file_bytes: bytes) -> str:
@@ -17,64 +48,208 @@ def extract_text_from_bytes(filename: str, file_bytes: bytes) -> str:
         return file_bytes.decode("utf-8", errors="ignore").strip()
 
     if filename.endswith(".pdf"):
-        text = _extract_pdf_text(file_bytes)
-
-        if len(text.strip()) < MIN_TEXT_LENGTH:
-            print("⚠️ Low text detected → running OCR")
-            text = _extract_pdf_text_ocr(file_bytes)
-
-        return text.strip()
+        # Same path as uploads on disk; page workers open the PDF by path
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_path = Path(tmp_dir) / "upload.pdf"
+            pdf_path.write_bytes(file_bytes)
+            return extract_text_from_file(pdf_path).strip()
 
     raise HTTPException(status_code=415, detail="Unsupported file type")
 
 
-def _extract_pdf_text(file_bytes: bytes) -> str:
-    """Extract text from digital PDFs"""
-    text_chunks = []
-
-    with pdfplumber.open(BytesIO(file_bytes)) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_chunks.append(page_text)
-
-    return "\n".join(text_chunks)
+def _extract_pdf_text(pdf_path: Path, ocr: bool) -> str:
+    try:
+        pages = extract_pdf_pages(pdf_path, ocr=ocr)
+    except OCRError as e:
+        raise HTTPException(status_code=400, detail=f"OCR failed: {e}")
 
+    return "\n".join(page.text for page in pages if page.text.strip())
 
-def _extract_pdf_text_ocr(file_bytes: bytes) -> str:
-    """OCR fallback for scanned PDFs"""
-    try:
-        from pdf2image import convert_from_bytes
-        import pytesseract
 
-        images = convert_from_bytes(file_bytes)
-        print(f"🖼 OCR pages detected: {len(images)}")
+def extract_pdf_pages(
+    pdf_path: Path,
+    ocr: bool = True,
+    workers: int = EXTRACTION_WORKERS
+) -> List[PageText]:
+    """
+    Text of every page, in page order.
+
+    Digital text is extracted page-parallel on the extraction pool; only
+    pages with less than MIN_PAGE_TEXT_LENGTH characters go to OCR, which
+    rasterises them lazily, OCR_WINDOW_PAGES consecutive pages per task.
+    A window that fails to OCR is logged and keeps its digital text;
+    OCRError is raised only if the document is left with less than
+    MIN_TEXT_LENGTH characters.
+    """
+    started = time.perf_counter()
+    pdf_path = str(pdf_path)
+
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+    if page_count == 0:
+        return []
+
+    parallel = workers > 1 and page_count > _INLINE_MAX_PAGES
+    per_task = min(_MAX_PAGES_PER_TASK, max(1, page_count // (workers * 4)))
+
+    pages = {}
+    ranges = [
+        (pdf_path, start, min(start + per_task, page_count))
+        for start in range(0, page_count, per_task)
+    ]
+    for result in _run_tasks(_extract_page_range, ranges, parallel):
+        for page in result:
+            pages[page.page] = page
+
+    low_text = [
+        i for i in range(page_count)
+        if len(pages[i].text.strip()) < MIN_PAGE_TEXT_LENGTH
+    ]
+
+    if ocr and low_text:
+        print(f"⚠️ Low text on {len(low_text)}/{page_count} pages → running OCR")
+        windows = [(pdf_path, window, OCR_DPI) for window in _ocr_windows(low_text, OCR_WINDOW_PAGES)]
+
+        failed = []
+        for result in _run_tasks(
+            _ocr_page_window, windows, workers > 1 and len(windows) > 1,
+            on_error=lambda task, e: failed.append((task[1], e))
+        ):
+            for page in result:
+                print(f"📄 OCR page {page.page} text length: {len(page.text)} ({page.seconds:.2f}s)")
+                digital = pages[page.page]
+                if len(page.text.strip()) > len(digital.text.strip()):
+                    page.seconds += digital.seconds
+                    pages[page.page] = page
+
+        # A failed window keeps its digital text; only a document that has
+        # essentially none of its own actually needed OCR to work
+        for window, e in failed:
+            logger.warning("OCR failed for pages %d-%d of %s: %s", window[0], window[-1], pdf_path, e)
+        if failed and sum(len(page.text.strip()) for page in pages.values()) < MIN_TEXT_LENGTH:
+            raise OCRError(str(failed[0][1]))
+
+    ordered = [pages[i] for i in range(page_count)]
+    _report_timing(ordered, time.perf_counter() - started)
+    return ordered
+
+
+def _report_timing(pages: List[PageText], elapsed: float):
+    for page in pages:
+        logger.debug("page %d: %s, %d chars, %.3fs", page.page, page.method, len(page.text), page.seconds)
+
+    slowest = max(pages, key=lambda p: p.seconds)
+    ocr_pages = sum(1 for p in pages if p.method == "ocr")
+    print(
+        f"📄 Extracted {len(pages)} pages ({ocr_pages} OCR) in {elapsed:.2f}s, "
+        f"slowest page {slowest.page} ({slowest.method}) {slowest.seconds:.2f}s"
+    )
+
+
+def _ocr_windows(pages: List[int], size: int) -> List[List[int]]:
+    """Consecutive runs of `pages`, at most `size` long."""
+    windows = []
+    for page in pages:
+        if windows and page == windows[-1][-1] + 1 and len(windows[-1]) < size:
+            windows[-1].append(page)
+        else:
+            windows.append([page])
+    return windows
+
+
+# Page workers (run in the extraction pool)
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[PageText]:
+    results = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for i in range(start, end):
+            page_started = time.perf_counter()
+            page = pdf.pages[i]
+            text = page.extract_text() or ""
+            page.flush_cache()
+            results.append(PageText(i, text, "text", time.perf_counter() - page_started))
+    return results
+
+
+def _ocr_page_window(pdf_path: str, pages: Sequence[int], dpi: int) -> List[PageText]:
+    from pdf2image import convert_from_path
+    import pytesseract
+
+    raster_started = time.perf_counter()
+    images = convert_from_path(
+        pdf_path, dpi=dpi, first_page=pages[0] + 1, last_page=pages[-1] + 1
+    )
+    raster_seconds = (time.perf_counter() - raster_started) / max(1, len(images))
+
+    results = []
+    for page, image in zip(pages, images):
+        ocr_started = time.perf_counter()
+        text = pytesseract.image_to_string(image, config="--psm 6")
+        image.close()
+        results.append(PageText(page, text, "ocr", raster_seconds + time.perf_counter() - ocr_started))
+    return results
+
+
+def _init_extraction_worker():
+    # One Tesseract thread per process; the pool provides the parallelism
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_extraction_worker
+            )
+        return _pool
+
+
+def shutdown_extraction_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
 
-        ocr_text = []
-        for i, img in enumerate(images):
-            text = pytesseract.image_to_string(img, config="--psm 6")
-            print(f"📄 OCR page {i} text length: {len(text)}")
-            if text.strip():
-                ocr_text.append(text)
+def _run_tasks(
+    fn: Callable,
+    tasks: List[tuple],
+    parallel: bool,
+    on_error: Optional[Callable[[tuple, Exception], None]] = None
+) -> Iterator:
+    """
+    fn(*task) for every task, in order. With `on_error`, a failing task is
+    reported to it and skipped instead of aborting the rest.
+    """
+    futures = [get_extraction_pool().submit(fn, *task) for task in tasks] if parallel else None
 
-        return "\n".join(ocr_text)
+    for i, task in enumerate(tasks):
+        try:
+            yield futures[i].result() if parallel else fn(*task)
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(task, e)
 
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"OCR failed: {e}")
 
 def extract_text_from_file(file_path: Path) -> str:
+    """Text of an upload on disk; OCR of scanned PDF pages is best-effort."""
     suffix = file_path.suffix.lower()
 
     if suffix == ".txt":
         return file_path.read_text(encoding="utf-8", errors="ignore")
 
     if suffix == ".pdf":
-        text = []
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text.append(page_text)
-        return "\n".join(text)
-
-    raise ValueError(f"Unsupported file type: {suffix}")
\ No newline at end of file
+        return _extract_pdf_text(file_path, ocr=True)
+
+    raise ValueError(f"Unsupported file type: {suffix}")
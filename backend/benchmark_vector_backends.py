@@ -0,0 +1,80 @@
+import argparse
+import time
+
+import numpy as np
+
+from app.core.config import EMBEDDING_MODEL_NAME
+from app.db.corpus_shards import get_corpus_shards
+from app.db.vector_backends import (
+    FlatIndexBackend,
+    IVFIndexBackend,
+    build_ivf_index,
+    get_ivf_lists,
+    get_vector_backend,
+)
+from app.services.analysis.embedding_store import get_embedding_store
+from app.services.analysis.model_registry import get_model
+
+# Compares recall@k and latency of every vector backend on the same corpus.
+# Exact flat search is the ground truth. Run ingest.py first.
+
+
+def make_queries(documents, n, seed=0):
+    """Corpus sentences with every 5th word dropped, so hits are not trivial."""
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(documents), size=min(n, len(documents)), replace=False)
+    queries = []
+    for i in picked:
+        words = documents[i].split()
+        queries.append(" ".join(w for j, w in enumerate(words) if j % 5 != 4))
+    return queries
+
+
+def run(backend, embeddings, top_k):
+    started = time.perf_counter()
+    result = backend.query_batch(embeddings, top_k=top_k)
+    elapsed = time.perf_counter() - started
+    return result["ids"], elapsed
+
+
+def recall(truth, found):
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / max(1, sum(len(t) for t in truth))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    store = get_embedding_store(EMBEDDING_MODEL_NAME)
+    if store is None:
+        raise RuntimeError("No embedding store found, run ingest.py first")
+
+    queries = make_queries(store.documents, args.queries)
+    embeddings = np.asarray(
+        get_model(EMBEDDING_MODEL_NAME).encode(queries, normalize_embeddings=True),
+        dtype=np.float32
+    )
+    print(f"Corpus: {len(store)} vectors, {len(queries)} queries, top_k={args.top_k}")
+
+    truth, elapsed = run(FlatIndexBackend(store), embeddings, args.top_k)
+    print(f"{'flat':<12} recall=1.000  {elapsed * 1000 / len(queries):8.3f} ms/query")
+
+    shards = get_corpus_shards()
+    found, elapsed = run(get_vector_backend(shards, "chroma"), embeddings, args.top_k)
+    label = f"chroma/{len(shards)}" if len(shards) > 1 else "chroma"
+    print(f"{label:<12} recall={recall(truth, found):.3f}  {elapsed * 1000 / len(queries):8.3f} ms/query")
+
+    # Trained here if ingest ran without VECTOR_BACKEND=ivf
+    lists = get_ivf_lists(store) or build_ivf_index(store)
+    for nprobe in args.nprobe:
+        found, elapsed = run(IVFIndexBackend(store, nprobe=nprobe, lists=lists), embeddings, args.top_k)
+        label = f"ivf/{nprobe}"
+        print(f"{label:<12} recall={recall(truth, found):.3f}  {elapsed * 1000 / len(queries):8.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
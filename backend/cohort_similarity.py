@@ -0,0 +1,90 @@
+import argparse
+import os
+import tempfile
+import time
+
+from app.core.config import (
+    EMBEDDING_MODEL_NAME,
+    PARAPHRASE_MODEL_NAME,
+    COHORT_REPORT_PATH,
+    COHORT_BLOCK_SIZE,
+    COHORT_WORKERS,
+    COHORT_BOILERPLATE_FRACTION,
+)
+from app.services.analysis.text_similarity import SIMILARITY_THRESHOLD
+from app.services.plagiarism.cohort_index import safe_course_id
+from app.services.plagiarism.cohort_pairs import (
+    compute_cohort_pairs,
+    load_cohort_submissions,
+    write_cohort_report,
+)
+
+# Pairwise collusion report for one course: every submission uploaded with
+# --course against every other, sentence by sentence. Writes pairs.csv,
+# sentence_pairs.npz, submissions.json and manifest.json.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="All-pairs similarity over a course cohort")
+    parser.add_argument("--course", required=True, help="course_id the submissions were uploaded with")
+    parser.add_argument("--model", choices=["embedding", "paraphrase"], default="embedding")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument("--block-size", type=int, default=COHORT_BLOCK_SIZE)
+    parser.add_argument("--workers", type=int, default=COHORT_WORKERS)
+    parser.add_argument("--boilerplate-fraction", type=float, default=COHORT_BOILERPLATE_FRACTION)
+    parser.add_argument("--output", help="report directory (default: COHORT_REPORT_PATH/<course>)")
+    parser.add_argument("--top", type=int, default=20, help="submission pairs to print")
+    args = parser.parse_args()
+
+    model_name = EMBEDDING_MODEL_NAME if args.model == "embedding" else PARAPHRASE_MODEL_NAME
+    output_dir = args.output or os.path.join(COHORT_REPORT_PATH, safe_course_id(args.course))
+
+    started = time.perf_counter()
+    submissions = load_cohort_submissions(args.course)
+    if len(submissions) < 2:
+        raise RuntimeError(f"Need at least two analysable submissions for course {args.course}")
+
+    sentences = sum(len(s.sentences) for s in submissions)
+    print(f"Cohort {args.course}: {len(submissions)} submissions, {sentences} sentences, model {model_name}")
+
+    # The stacked embedding matrix lives on disk only while the job runs
+    os.makedirs(output_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=output_dir) as work_dir:
+        pairs = compute_cohort_pairs(
+            submissions,
+            work_dir,
+            model_name=model_name,
+            threshold=args.threshold,
+            block_size=args.block_size,
+            workers=args.workers,
+            boilerplate_fraction=args.boilerplate_fraction
+        )
+
+    summary = write_cohort_report(
+        args.course,
+        pairs,
+        output_dir,
+        model=model_name,
+        threshold=args.threshold,
+        block_size=args.block_size,
+        boilerplate_fraction=args.boilerplate_fraction
+    )
+
+    elapsed = time.perf_counter() - started
+    stages = ", ".join(f"{stage} {value:.1f}s" for stage, value in pairs.seconds.items())
+    print(
+        f"{len(pairs.row_a)} sentence pairs, {len(summary)} submission pairs "
+        f"({pairs.boilerplate_rows} template sentences skipped) in {elapsed:.1f}s: {stages}"
+    )
+
+    for row in summary[:args.top]:
+        print(
+            f"{row['assignment_a']} ({row['student_a']}) <-> {row['assignment_b']} ({row['student_b']}): "
+            f"{row['coverage_a']:.0%} / {row['coverage_b']:.0%} of sentences, "
+            f"{row['exact_sentences']} verbatim, max {row['max_similarity']:.3f}"
+        )
+    print(f"Report written to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
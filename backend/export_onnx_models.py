@@ -0,0 +1,77 @@
+import argparse
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from app.core.config import EMBEDDING_MODEL_NAME, PARAPHRASE_MODEL_NAME
+from app.services.analysis.onnx_encoder import OnnxSentenceEncoder, export_onnx_model
+from app.services.analysis.text_similarity import segment_sentences
+
+# Exports the embedding models to ONNX (float32 + dynamic int8) and checks
+# that their embeddings stay within tolerance of the PyTorch models.
+# Select the exports with EMBEDDING_MODEL_BACKEND / PARAPHRASE_MODEL_BACKEND=onnx.
+# Needs requirements-onnx.txt (onnxruntime, onnx).
+
+PARITY_SENTENCES = [
+    "The mitochondria is the powerhouse of the cell.",
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "In 1914 the assassination of Archduke Franz Ferdinand set off a chain of alliances.",
+    "Supply and demand determine the equilibrium price in a competitive market.",
+    "Short one.",
+    "A considerably longer sentence that keeps going with several clauses, commas and "
+    "qualifications, so that it is padded very differently from the short ones in its batch.",
+]
+
+
+def parity(name, quantized, sentences, tolerance):
+    reference = SentenceTransformer(name, device="cpu")
+    expected = reference.encode(sentences, normalize_embeddings=True)
+
+    encoder = OnnxSentenceEncoder(name, quantized=quantized)
+    started = time.perf_counter()
+    actual = encoder.encode(sentences, normalize_embeddings=True)
+    elapsed = time.perf_counter() - started
+
+    cosine = np.sum(expected * actual, axis=1)
+    worst = float(1 - cosine.min())
+    label = "int8" if quantized else "float32"
+    status = "ok" if worst <= tolerance else "FAILED"
+    print(
+        f"{name} [{label}]: min cosine={cosine.min():.5f} "
+        f"max |diff|={np.abs(expected - actual).max():.5f} "
+        f"{elapsed * 1000 / len(sentences):.2f} ms/sentence -> {status}"
+    )
+    return worst <= tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", nargs="+", default=[EMBEDDING_MODEL_NAME, PARAPHRASE_MODEL_NAME])
+    parser.add_argument("--no-quantize", action="store_true", help="skip the int8 export")
+    parser.add_argument("--check-only", action="store_true", help="only run the parity check")
+    parser.add_argument("--text-file", help="extra sentences for the parity check")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="max 1 - cosine for float32")
+    parser.add_argument("--int8-tolerance", type=float, default=0.05, help="max 1 - cosine for int8")
+    args = parser.parse_args()
+
+    sentences = list(PARITY_SENTENCES)
+    if args.text_file:
+        with open(args.text_file, encoding="utf-8") as f:
+            sentences.extend(segment_sentences(f.read()))
+
+    ok = True
+    for name in args.models:
+        if not args.check_only:
+            print(f"Exported {name} to {export_onnx_model(name, quantize=not args.no_quantize)}")
+
+        ok &= parity(name, False, sentences, args.tolerance)
+        if not args.no_quantize:
+            ok &= parity(name, True, sentences, args.int8_tolerance)
+
+    if not ok:
+        raise SystemExit("ONNX parity check failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import time
+
+from app.core.config import PARAPHRASE_MODEL_NAME
+from app.db.chroma_client import ChromaSearchClient
+from app.db.corpus_shards import get_corpus_shards
+from app.db.vector_backends import get_vector_backend
+from app.services.analysis.embedding_store import get_embedding_store
+from app.services.analysis.paraphrase import ParaphraseDetector
+from app.services.analysis.pipeline import get_corpus_collection
+from app.services.analysis.text_similarity import SemanticSimilarityService
+from benchmark_vector_backends import make_queries
+
+# Paraphrase flags lost by the MiniLM -> mpnet cascade versus scoring the
+# whole corpus with mpnet, for several candidate counts. Run ingest.py first.
+
+
+def flag_keys(flags):
+    return {(f["sentence_id"], f["matched_sentence"]) for f in flags}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 25, 50, 100, 200])
+    args = parser.parse_args()
+
+    store = get_embedding_store(PARAPHRASE_MODEL_NAME)
+    if store is None:
+        raise RuntimeError("No paraphrase embedding store found, run ingest.py first")
+
+    search = SemanticSimilarityService(
+        ChromaSearchClient(get_corpus_collection(), backend=get_vector_backend(get_corpus_shards()))
+    )
+    detector = ParaphraseDetector(store)
+    sentences = make_queries(store.documents, args.queries)
+    print(f"Corpus: {len(store)} sentences, {len(sentences)} queries")
+
+    started = time.perf_counter()
+    exhaustive = flag_keys(detector.detect_batch(sentences))
+    elapsed = time.perf_counter() - started
+    print(f"{'exhaustive':<14} flags={len(exhaustive):6d}  lost=     0  {elapsed * 1000 / len(sentences):8.3f} ms/sentence")
+
+    for n in args.candidates:
+        started = time.perf_counter()
+        matches = search.search(sentences, top_k=n)
+        found = flag_keys(detector.detect_candidates(sentences, matches["ids"]))
+        elapsed = time.perf_counter() - started
+
+        lost = len(exhaustive - found)
+        share = lost / max(1, len(exhaustive))
+        label = f"cascade/{n}"
+        print(f"{label:<14} flags={len(found):6d}  lost={lost:6d} ({share:.1%})  {elapsed * 1000 / len(sentences):8.3f} ms/sentence")
+
+
+if __name__ == "__main__":
+    main()
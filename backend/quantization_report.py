@@ -0,0 +1,86 @@
+import argparse
+import time
+
+import numpy as np
+
+from app.core.config import EMBEDDING_MODEL_NAME
+from app.db.vector_backends import FlatIndexBackend
+from app.services.analysis.embedding_store import (
+    CorpusEmbeddingStore,
+    get_embedding_store,
+    quantize,
+)
+from app.services.analysis.model_registry import get_model
+from benchmark_vector_backends import make_queries, recall, run
+
+# Recall and memory of float16 / int8 corpus storage against exact float32
+# search, with and without the float32 re-rank. Run ingest.py first.
+
+
+def quantized_copy(store, quantization):
+    embeddings = np.asarray(store.embeddings, dtype=np.float32)
+    codes, scales = quantize(embeddings, quantization)
+    manifest = dict(store.manifest, quantization=quantization)
+    return CorpusEmbeddingStore(
+        manifest=manifest,
+        embeddings=store.embeddings,
+        ids=store.ids,
+        documents=store.documents,
+        sources=store.sources,
+        codes=codes,
+        scales=scales
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    store = get_embedding_store(args.model)
+    if store is None:
+        raise RuntimeError("No embedding store found, run ingest.py first")
+
+    queries = make_queries(store.documents, args.queries)
+    embeddings = np.asarray(
+        get_model(args.model).encode(queries, normalize_embeddings=True),
+        dtype=np.float32
+    )
+    float32_store = CorpusEmbeddingStore(
+        manifest=dict(store.manifest, quantization="float32"),
+        embeddings=store.embeddings,
+        ids=store.ids,
+        documents=store.documents,
+        sources=store.sources
+    )
+    print(f"Corpus: {len(store)} vectors, {len(queries)} queries, top_k={args.top_k}")
+
+    truth, elapsed = run(FlatIndexBackend(float32_store), embeddings, args.top_k)
+    print(
+        f"{'float32':<16} {store.embeddings.nbytes / 2**20:9.1f} MiB  "
+        f"recall=1.000  {elapsed * 1000 / len(queries):8.3f} ms/query"
+    )
+
+    exact_scores = float32_store.similarities(embeddings[:64])
+
+    for quantization in ("float16", "int8"):
+        started = time.perf_counter()
+        quantized = quantized_copy(store, quantization)
+        built = time.perf_counter() - started
+
+        size = quantized.codes.nbytes
+        if quantized.scales is not None:
+            size += quantized.scales.nbytes
+        error = np.abs(quantized.similarities(embeddings[:64]) - exact_scores).max()
+        print(f"{quantization:<16} {size / 2**20:9.1f} MiB  max |score error|={error:.4f}  built in {built:.1f}s")
+
+        for rerank in (False, True):
+            found, elapsed = run(FlatIndexBackend(quantized, rerank=rerank), embeddings, args.top_k)
+            label = f"  {'+rerank' if rerank else 'no rerank'}"
+            print(f"{label:<16} {'':13}  recall={recall(truth, found):.3f}  {elapsed * 1000 / len(queries):8.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()